@@ -1,10 +1,15 @@
 import pandas as pd
-# from pathlib import Path # Not used anymore
-# import csv # Not used anymore
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import csv
+import email.utils
 import os
+import shutil
+import zipfile
 import requests # Keep for downloading cities/admin files
 import logging
-# import time # No longer needed for SerpApi rate limiting
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 # Load environment variables from .env file (still useful if other env vars are used)
@@ -45,28 +50,36 @@ COUNTRY_SETTINGS = {
     'FK': {'hl': 'en', 'gl': 'FK'}, 'BQ': {'hl': 'nl', 'gl': 'BQ'},
 }
 
+# Flat country -> hl/gl lookups restricted to the Americas (defaults: hl 'en', gl = country code).
+# Key order is shared, so a country's position in either dict doubles as its filter index.
+_HL_BY_CC = {cc: COUNTRY_SETTINGS.get(cc, {}).get('hl', 'en') for cc in sorted(NA_SA_CODES)}
+_GL_BY_CC = {cc: COUNTRY_SETTINGS.get(cc, {}).get('gl', cc) for cc in sorted(NA_SA_CODES)}
+# The same lookups as Arrow arrays, built once for index_in/take in build_shortlist
+_AMERICAS_CC_ARRAY = pa.array(list(_HL_BY_CC))
+_HL_ARRAY = pa.array(list(_HL_BY_CC.values()))
+_GL_ARRAY = pa.array(list(_GL_BY_CC.values()))
+
 # Define city-specific overrides
 CITY_OVERRIDES = {
     'Montréal': {'hl': 'fr'},
     'Québec': {'hl': 'fr'},    # Assuming name in file is 'Québec' for Québec City
     'Paramaribo': {'hl': 'nl'}, # Matches default for SR, but explicit override is fine
 }
+_OVERRIDES_DF = pd.DataFrame.from_dict(CITY_OVERRIDES, orient='index').rename_axis('name')
 
 # Define the URL for the GeoNames cities file
 CITIES_FILE_URL = "https://download.geonames.org/export/dump/cities15000.zip"
 CITIES_FILE_ZIP = "data/cities15000.zip"
-CITIES_FILE_TXT = "data/cities15000.txt"
+CITIES_FILE_MEMBER = "cities15000.txt"  # read in place from the zip, never extracted
 
 # Define the URL for the GeoNames admin1 codes file
 ADMIN1_FILE_URL = "https://download.geonames.org/export/dump/admin1CodesASCII.txt"
 ADMIN1_FILE_TXT = "data/admin1CodesASCII.txt"
+ADMIN1_FILE_PARQUET = ADMIN1_FILE_TXT + ".parquet"  # parsed cache of the file above
 
 # Define the output file path
 OUTPUT_CSV_FILE = "data/cities_shortlist.csv"
 
-# SerpApi Locations API endpoint -- NO LONGER USED
-# SERPAPI_LOCATIONS_URL = "https://serpapi.com/locations.json"
-
 # Define column names for cities15000.txt based on GeoNames format
 COLUMN_NAMES = [
     'geonameid', 'name', 'asciiname', 'alternatenames', 'latitude', 'longitude',
@@ -75,84 +88,110 @@ COLUMN_NAMES = [
     'dem', 'timezone', 'modification_date'
 ]
 
+# Columns actually needed from cities15000.txt (make sure latitude and longitude are loaded!)
+CITY_COLUMNS = ['geonameid', 'name', 'asciiname', 'latitude', 'longitude', 'country_code', 'admin1_code', 'population', 'timezone']
+
+# Explicit Arrow types for those columns so nothing is inferred. Coordinates stay float64 so
+# the written lat/lng are unchanged; country_code stays plain string for the index_in lookup.
+CITY_COLUMN_TYPES = {
+    'geonameid': pa.int32(),
+    'name': pa.string(),
+    'asciiname': pa.string(),
+    'latitude': pa.float64(),
+    'longitude': pa.float64(),
+    'country_code': pa.string(),
+    'admin1_code': pa.string(),
+    'population': pa.int32(),
+    'timezone': pa.dictionary(pa.int32(), pa.string()),
+}
+
 # Define column names for admin1CodesASCII.txt
 ADMIN1_COLUMN_NAMES = ['code', 'name', 'name_ascii', 'geonameid_admin1']
 
+# Shared HTTP session so both downloads reuse pooled keep-alive connections
+_SESSION = requests.Session()
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+def _skip_bad_row(row):
+    """pyarrow invalid-row handler: log and skip, mirroring pandas' on_bad_lines='warn'."""
+    logging.warning(f"Skipping malformed line {row.number}: {row.text[:80]!r}")
+    return 'skip'
+
 def download_file(url, local_path):
-    """Downloads a file from a URL to a local path if it doesn't exist."""
-    if not os.path.exists(local_path):
-        logging.info(f"Downloading {os.path.basename(local_path)} from {url}...")
-        try:
-            response = requests.get(url, stream=True)
+    """Downloads a file from a URL to a local path unless the local copy is still current.
+
+    An existing file is revalidated with If-Modified-Since (its mtime is set from the
+    server's Last-Modified), so an unchanged file costs one 304 round trip. New content
+    is written to a .tmp file and only moved into place once complete (and, for zips,
+    readable), so a failed run never leaves a truncated file behind.
+    """
+    request_headers = {}
+    if os.path.exists(local_path):
+        request_headers['If-Modified-Since'] = email.utils.formatdate(os.path.getmtime(local_path), usegmt=True)
+    tmp_path = local_path + '.tmp'
+    try:
+        with _SESSION.get(url, headers=request_headers, stream=True) as response:
+            if response.status_code == 304:
+                logging.info(f"{os.path.basename(local_path)} is up to date.")
+                return
             response.raise_for_status()  # Raise an exception for bad status codes
-            with open(local_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            logging.info(f"Successfully downloaded {os.path.basename(local_path)}.")
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Error downloading {url}: {e}")
-            if os.path.exists(local_path):
-                os.remove(local_path) # Clean up partially downloaded file
-            raise # Re-raise the exception to halt execution
-    else:
-        logging.info(f"{os.path.basename(local_path)} already exists locally.")
-
-# --- REMOVED get_serpapi_canonical_location function ---
-# def get_serpapi_canonical_location(city_name, country_code, api_key):
-#     ...
+            logging.info(f"Downloading {os.path.basename(local_path)} from {url}...")
+            response.raw.decode_content = True  # Undo any transfer gzip, as iter_content did
+            with open(tmp_path, 'wb') as f:
+                shutil.copyfileobj(response.raw, f, length=1024 * 1024)
+            last_modified = response.headers.get('Last-Modified')
+        if local_path.endswith('.zip') and not zipfile.is_zipfile(tmp_path):
+            raise zipfile.BadZipFile(f"{url} did not return a valid zip file")
+        if last_modified:
+            mtime = email.utils.parsedate_to_datetime(last_modified).timestamp()
+            os.utime(tmp_path, (mtime, mtime))
+        os.replace(tmp_path, local_path)
+        logging.info(f"Successfully downloaded {os.path.basename(local_path)}.")
+    except (requests.exceptions.RequestException, zipfile.BadZipFile) as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path) # Clean up partially downloaded file
+        if os.path.exists(local_path):
+            logging.warning(f"Could not refresh {os.path.basename(local_path)} ({e}); using the existing copy.")
+            return
+        logging.error(f"Error downloading {url}: {e}")
+        raise # Re-raise the exception to halt execution
 
 def build_shortlist():
-    """Filters cities15000, adds hl/gl, merges admin1 names, writes to CSV, deletes source."""
-    # 0. Get SerpAPI Key -- NO LONGER NEEDED FOR THIS SCRIPT
-    # serpapi_key = os.getenv("SERPAPI_API_KEY")
-    # if not serpapi_key:
-    #     logging.error("SERPAPI_API_KEY environment variable not set. Cannot fetch canonical locations or run pipeline.")
-    #     return
-
-    # 1. Download required files
-    download_file(CITIES_FILE_URL, CITIES_FILE_ZIP)
-    download_file(ADMIN1_FILE_URL, ADMIN1_FILE_TXT)
-
-    # 2. Unzip the cities file (if not already unzipped)
-    if not os.path.exists(CITIES_FILE_TXT):
-        import zipfile
-        logging.info(f"Unzipping {CITIES_FILE_ZIP}...")
-        try:
-            with zipfile.ZipFile(CITIES_FILE_ZIP, 'r') as zip_ref:
-                zip_ref.extractall("data/")
-            logging.info(f"Successfully unzipped to {CITIES_FILE_TXT}.")
-        except zipfile.BadZipFile:
-            logging.error(f"Error: {CITIES_FILE_ZIP} is not a valid zip file or is corrupted.")
-            if os.path.exists(CITIES_FILE_TXT):
-                 os.remove(CITIES_FILE_TXT)
-            os.remove(CITIES_FILE_ZIP)
-            logging.info("Removed potentially corrupted zip and text files. Please re-run the script.")
-            return
-        except Exception as e:
-            logging.error(f"An unexpected error occurred during unzipping: {e}")
-            return
-    else:
-        logging.info(f"{CITIES_FILE_TXT} already exists.")
+    """Filters cities15000, adds hl/gl, merges admin1 names, writes to CSV.  Source downloads are kept for revalidation on the next run."""
+    # 1. Download required files (independent fetches, so run them side by side)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        downloads = [
+            executor.submit(download_file, CITIES_FILE_URL, CITIES_FILE_ZIP),
+            executor.submit(download_file, ADMIN1_FILE_URL, ADMIN1_FILE_TXT),
+        ]
+        for future in downloads:
+            future.result()  # Re-raises any download error, as the serial calls did
 
-    # 3. Load Admin1 Names
+    # 2. Load Admin1 Names
     logging.info(f"Loading admin1 names from {ADMIN1_FILE_TXT}...")
     try:
-        df_admin1 = pd.read_csv(
-            ADMIN1_FILE_TXT,
-            sep='\t',
-            header=None,
-            names=ADMIN1_COLUMN_NAMES,
-            usecols=['code', 'name'],
-            encoding='utf-8',
-            on_bad_lines='warn'
-        )
-        df_admin1['country_admin1_key'] = df_admin1['code']
-        df_admin1 = df_admin1[['country_admin1_key', 'name']].rename(columns={'name': 'admin1_name'})
-        admin1_map = df_admin1.set_index('country_admin1_key')['admin1_name'].to_dict()
-        logging.info(f"Loaded {len(admin1_map)} admin1 names.")
+        # Reuse the Parquet sidecar while it is newer than the text file it was built from
+        if os.path.exists(ADMIN1_FILE_PARQUET) and os.path.getmtime(ADMIN1_FILE_PARQUET) >= os.path.getmtime(ADMIN1_FILE_TXT):
+            df_admin1 = pd.read_parquet(ADMIN1_FILE_PARQUET)
+        else:
+            df_admin1 = pd.read_csv(
+                ADMIN1_FILE_TXT,
+                sep='\t',
+                header=None,
+                names=ADMIN1_COLUMN_NAMES,
+                usecols=['code', 'name'],
+                encoding='utf-8',
+                on_bad_lines='warn'
+            )
+            try:
+                df_admin1.to_parquet(ADMIN1_FILE_PARQUET, index=False)
+            except Exception as e:
+                logging.warning(f"Could not write admin1 cache {ADMIN1_FILE_PARQUET}: {e}")
+        # Kept as an indexed Series: map() looks keys up through its hash index directly
+        admin1_names = df_admin1.set_index('code')['name'].rename('admin1_name')
+        logging.info(f"Loaded {len(admin1_names)} admin1 names.")
     except FileNotFoundError:
         logging.error(f"Error: {ADMIN1_FILE_TXT} not found. Cannot proceed.")
         return
@@ -160,67 +199,70 @@ def build_shortlist():
         logging.error(f"Error loading admin1 names: {e}")
         return
 
-    # 4. Load and Process Cities Data
-    logging.info(f"Loading cities data from {CITIES_FILE_TXT}...")
+    # 3. Load and Process Cities Data
+    logging.info(f"Loading cities data from {CITIES_FILE_ZIP}:{CITIES_FILE_MEMBER}...")
+    # Parsed with Arrow's multithreaded CSV reader straight from the zip member (no
+    # extracted copy on disk); the Americas filter runs on the Arrow table so only
+    # the surviving rows are materialized as a DataFrame.
     try:
-        df = pd.read_csv(
-            CITIES_FILE_TXT,
-            sep='\t',
-            header=None,
-            names=COLUMN_NAMES,
-            # Make sure latitude and longitude are loaded!
-            usecols=['name', 'asciiname', 'latitude', 'longitude', 'country_code', 'admin1_code', 'population', 'timezone', 'geonameid'],
-            encoding='utf-8',
-            low_memory=False,
-            on_bad_lines='warn'
-        )
+        with zipfile.ZipFile(CITIES_FILE_ZIP) as zip_ref, zip_ref.open(CITIES_FILE_MEMBER) as cities_file:
+            table = pv.read_csv(
+                cities_file,
+                read_options=pv.ReadOptions(column_names=COLUMN_NAMES, encoding='utf8'),
+                parse_options=pv.ParseOptions(delimiter='\t', quote_char=False, invalid_row_handler=_skip_bad_row),
+                convert_options=pv.ConvertOptions(
+                    include_columns=CITY_COLUMNS,
+                    column_types=CITY_COLUMN_TYPES,
+                ),
+            )
     except FileNotFoundError:
-        logging.error(f"Error: {CITIES_FILE_TXT} not found. Cannot proceed.")
+        logging.error(f"Error: {CITIES_FILE_ZIP} not found. Cannot proceed.")
+        return
+    except zipfile.BadZipFile:
+        logging.error(f"Error: {CITIES_FILE_ZIP} is not a valid zip file or is corrupted.")
+        os.remove(CITIES_FILE_ZIP)
+        logging.info("Removed potentially corrupted zip file. Please re-run the script.")
         return
     except Exception as e:
         logging.error(f"Error loading cities data: {e}")
         return
 
-    logging.info(f"Processing {len(df)} cities...")
+    logging.info(f"Processing {table.num_rows} cities...")
 
-    df_americas = df[df['country_code'].isin(NA_SA_CODES)].copy()
+    # One lookup does both jobs: rows outside the Americas get a null index and are
+    # dropped, the rest use their index to pick up hl/gl.
+    cc_index = pc.index_in(table['country_code'], value_set=_AMERICAS_CC_ARRAY)
+    table = table.append_column('cc_index', cc_index).filter(pc.is_valid(cc_index))
+    table = table.append_column('hl', pc.take(_HL_ARRAY, table['cc_index']))
+    table = table.append_column('gl', pc.take(_GL_ARRAY, table['cc_index']))
+    # Dictionary-decode the code columns straight to categoricals: the concat
+    # step below then works over the small category table instead of every cell.
+    df_americas = table.drop_columns(['cc_index']).to_pandas(categories=['country_code', 'admin1_code'])
     logging.info(f"Filtered to {len(df_americas)} cities in the Americas.")
 
-    df_americas['population'] = pd.to_numeric(df_americas['population'], errors='coerce').fillna(0)
-    df_sorted = df_americas.sort_values(by='population', ascending=False)
-
-    df_limited = df_sorted.head(1250).copy()
+    # Partial (heap) selection of the top rows instead of sorting the whole frame
+    df_limited = df_americas.nlargest(1250, 'population').copy()
     logging.info(f"Limited to top {len(df_limited)} cities by population.")
 
-    # Apply country settings for hl/gl
-    df_limited['hl'] = df_limited['country_code'].map(lambda cc: COUNTRY_SETTINGS.get(cc, {'hl': 'en'}).get('hl'))
-    df_limited['gl'] = df_limited['country_code'].map(lambda cc: COUNTRY_SETTINGS.get(cc, {'gl': cc}).get('gl'))
-
     # Apply specific overrides
-    for city_name, overrides in CITY_OVERRIDES.items():
-        for col, val in overrides.items():
-            df_limited.loc[df_limited['name'] == city_name, col] = val
+    # One name-aligned update instead of a mask scan per (city, column) pair;
+    # cells an override doesn't set stay NaN in _OVERRIDES_DF and are left alone.
+    df_limited = df_limited.set_index('name', drop=False)
+    df_limited.update(_OVERRIDES_DF)
+    df_limited = df_limited.reset_index(drop=True)
     logging.info("Applied hl/gl logic and overrides.")
 
-    # 5. Merge Admin1 Names
-    df_limited['admin1_code'] = df_limited['admin1_code'].astype(str)
-    df_limited['country_admin1_key'] = df_limited['country_code'] + '.' + df_limited['admin1_code']
-    df_limited['admin1_name'] = df_limited['country_admin1_key'].map(admin1_map)
+    # 4. Merge Admin1 Names
+    # The "CC.admin1" key is only needed for the lookup, so it stays a temporary Series
+    admin1_keys = df_limited['country_code'].astype(str).str.cat(df_limited['admin1_code'].astype(str), sep='.')
+    df_limited['admin1_name'] = admin1_keys.map(admin1_names)
     logging.info("Merged admin1 names into city data.")
     missing_admin_count = df_limited['admin1_name'].isnull().sum()
     if missing_admin_count > 0:
         logging.warning(f"{missing_admin_count} cities did not have a matching admin1 name.")
 
-    # --- REMOVED STEP 6: Get Canonical SerpApi Location String ---
-    # logging.info("Fetching canonical location strings from SerpApi Locations API...")
-    # canonical_locations = []
-    # ... (loop removed)
-    # df_limited['serpapi_location_string'] = canonical_locations
-    # ...
-
-    # 7. Prepare and Write Output
+    # 5. Prepare and Write Output
     # Select and order columns for output
-    # REMOVED 'serpapi_location_string'
     output_columns = ['geonameid', 'name', 'asciiname', 'latitude', 'longitude', 'country_code', 'admin1_code', 'admin1_name', 'population', 'timezone', 'hl', 'gl']
     df_output = df_limited[output_columns]
 
@@ -230,24 +272,12 @@ def build_shortlist():
             OUTPUT_CSV_FILE,
             index=False,
             encoding='utf-8',
-            quoting=1 # QUOTE_ALL
+            quoting=csv.QUOTE_MINIMAL  # Only fields containing the delimiter/quotes get quoted
         )
         logging.info(f"Successfully wrote shortlist to {OUTPUT_CSV_FILE}.")
     except Exception as e:
         logging.error(f"Error writing CSV file: {e}")
         return
 
-    # 8. Clean up source files
-    try:
-        logging.info(f"Deleting source files: {CITIES_FILE_TXT}, {CITIES_FILE_ZIP}")
-        if os.path.exists(CITIES_FILE_TXT):
-            os.remove(CITIES_FILE_TXT)
-        if os.path.exists(CITIES_FILE_ZIP):
-            os.remove(CITIES_FILE_ZIP)
-        # Keep admin1CodesASCII.txt for future runs
-        logging.info("Cleaned up source files.")
-    except OSError as e:
-        logging.warning(f"Could not delete source file(s): {e}")
-
 if __name__ == "__main__":
     build_shortlist()
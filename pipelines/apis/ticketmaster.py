@@ -3,20 +3,23 @@ pipelines/apis/ticketmaster.py
 Hybrid Ticketmaster → Supabase pipeline
 
 • Pulls full Dance segment (with pagination)
-• Pulls per‑style keyword pages (without segment filter) for extra recall
-• Merges + de‑dupes raw events
+• Pulls per‑style keyword pages (without segment filter) for extra recall, in parallel under a 5 req/s limit
+• De‑dupes raw events by id as pages arrive
 • Filters out stage shows / concerts via PERFORMANCE_NOISE & venue guards
 • Keeps an event if (segment == Dance) OR (activity word present) OR (classified to watch style)
-• Writes to events_ticketmaster via bulk upsert
+• Writes to events_ticketmaster via bulk upsert (500-row chunks, 4 in flight)
 """
 
 from __future__ import annotations
-import os, re, time, requests
+import os, re, time, threading, httpx, orjson
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from datetime import datetime, UTC
 from urllib.parse import urljoin
 from typing import List, Dict, Any
 from dotenv import load_dotenv
 from supabase import create_client, Client
+from postgrest.types import ReturnMethod
 
 # ─────────────────── ENV & CLIENTS ───────────────────
 load_dotenv()
@@ -27,32 +30,42 @@ if not TM_KEY:
 
 supabase: Client | None = create_client(SB_URL, SB_KEY) if SB_URL and SB_KEY else None
 BASE_URL = "https://app.ticketmaster.com/discovery/v2/events.json"
+FETCH_WORKERS = 8          # concurrent keyword pulls
+TM_MAX_REQ_PER_SEC = 5     # Ticketmaster Discovery API rate limit
+UPSERT_CHUNK_SIZE = 500    # rows per PostgREST upsert request
+UPSERT_WORKERS = 4         # concurrent upsert requests
+
+# One HTTP/2 client shared by the fetch threads: their requests are multiplexed
+# over a kept-alive connection instead of each holding its own.
+HTTP_CLIENT = httpx.Client(http2=True, timeout=10, limits=httpx.Limits(max_connections=16))
 
 # ─────────────────── PATTERNS & CONSTANTS ────────────
+# Filter patterns are only ever used for .search(), so every group is non-capturing.
+# All patterns are lowercase and compiled without re.I: callers match against text
+# lowered once per event, which is cheaper than case-folding on every comparison.
 # More conservative list for high-confidence participatory signals
 STRONG_ACTIVITY_INDICATORS = re.compile(
-    r"\b(workshop|dance\s+class|dance\s+classes|lesson|dance\s+social|social\s+dance|milonga|praktika|(?:dance|disco)\s+party|participatory\s+dance|dance\s+practice|dance\s+session|tea\s+dance|day\s+disco|dance\s+night)\b", re.I
+    r"\b(?:workshop|dance\s+class|dance\s+classes|lesson|dance\s+social|social\s+dance|milonga|praktika|(?:dance|disco)\s+party|participatory\s+dance|dance\s+practice|dance\s+session|tea\s+dance|day\s+disco|dance\s+night)\b"
 )
 
 # General activity terms, more specific than before
 ACTIVITY = re.compile(
-    r"\b(workshop|dance\s+class|dance\s+classes|lesson|dance\s+social|social\s+dance|milonga|praktika|(?:dance|disco)\s+party|participatory\s+dance|dance\s+practice|dance\s+session|tea\s+dance|day\s+disco|dance\s+night|"
-    r"battle|swing|dance\s+jam|contact\s+jam|zumba|cypher|freestyle\s+session|open\s+styles|\bdance\b)\b", re.I
+    r"\b(?:workshop|dance\s+class|dance\s+classes|lesson|dance\s+social|social\s+dance|milonga|praktika|(?:dance|disco)\s+party|participatory\s+dance|dance\s+practice|dance\s+session|tea\s+dance|day\s+disco|dance\s+night|"
+    r"battle|swing|dance\s+jam|contact\s+jam|zumba|cypher|freestyle\s+session|open\s+styles|\bdance\b)\b"
 )
 
 THEATRE_ARENA = re.compile(
-    r"\b(theatre|theater|arena|stadium|coliseum|amphitheat(er|re)|centre|center|auditorium|hall|ballroom|music fair|pavilion|conservatory|city center|performing\s+arts\s+center|opera\s+house|guildhall|arts\s+centre|"
+    r"\b(?:theatre|theater|arena|stadium|coliseum|amphitheat(?:er|re)|centre|center|auditorium|hall|ballroom|music fair|pavilion|conservatory|city center|performing\s+arts\s+center|opera\s+house|guildhall|arts\s+centre|"
     r"echoplex|the echo|house of blues|kia center|win entertainment centre|thalia hall|beachland ballroom|mcmenamins crystal ballroom|la boom|cypress|"
-    r"O2 Guildhall|Martin Marietta Center for the Performing Arts|James K. Polk Theatre|The National|Mullett Arena|Harrison Opera House|Balboa Theatre|"
-    r"El Mocambo|Edinburgh Corn Exchange|The Blue Note)\b",
-    re.I,
+    r"o2 guildhall|martin marietta center for the performing arts|james k. polk theatre|the national|mullett arena|harrison opera house|balboa theatre|"
+    r"el mocambo|edinburgh corn exchange|the blue note)\b",
 )
 
 PERFORMANCE_NOISE = re.compile(
-    r"\b(ballet|swan lake|nutcracker|cinderella|giselle|romeo and juliet|don quixote|"
+    r"\b(?:ballet|swan lake|nutcracker|cinderella|giselle|romeo and juliet|don quixote|"
     r"sylphide|showcase|recital|broadway|disney|musical|opera|orchestra|choir|philharmonic|"
     r"high school musical|bop to the top|film|screening|movie|play|production|theatrical|"
-    r"concert|live music|ft\.|feat\.|presents|gala|awards|tour(e)?|comedy|stand-up|exhibition|"
+    r"concert|live music|ft\.|feat\.|presents|gala|awards|tour(?:e)?|comedy|stand-up|exhibition|"
     r"sonero|live band|album release|listening party|artist performs|band performs|dj set|headliner|opening act|special guest|life & trials of|festival|"
     r"school\s+of\s+dance|year-end\s+recital|student\s+showcase|dance\s+academy\s+presents|"
     r"dance\s+company|ballet\s+company|dance\s+troupe|professional\s+dancers|profesionales|"
@@ -61,55 +74,94 @@ PERFORMANCE_NOISE = re.compile(
     r"broadway\s+rave|musical\s+theatre\s+dance\s+party|"
     r"band|dance\s+show|dance\s+recital|dance\s+gavin\s+dance|"
     r"vibe\s+year-end\s+recitals|heist-\s+eleve\s+dance|an\s+irish\s+christmas)\b",
-    re.I,
 )
 
 STYLE_REGEX: dict[str, re.Pattern] = {
-    "Salsa": re.compile(r"\bsalsa\b", re.I),
-    "Bachata": re.compile(r"\bbachata\b", re.I),
-    "Hip-Hop": re.compile(r"\bhip[\s-]?hop\b", re.I),
-    "House": re.compile(r"\bhouse\b", re.I),
-    "Afrobeat": re.compile(r"\bafro[\s-]?beats?\b", re.I),
-    "Zouk": re.compile(r"\bzouk\b", re.I),
-    "Kizomba": re.compile(r"\bkiz(omba)?\b", re.I),
-    "Balboa": re.compile(r"\bbalboa\b", re.I),
-    "Breaking": re.compile(r"\bbreak\s?danc|\bb-boy|\bb-girl", re.I),
-    "East Coast Swing": re.compile(r"\beast\s+coast\s+swing\b|\becs\b", re.I),
-    "West Coast Swing": re.compile(r"\bwest\s+coast\s+swing\b|\bwcs\b", re.I),
-    "Ballroom": re.compile(r"\bballroom\b", re.I),
-    "Hustle": re.compile(r"\bhustle\b", re.I),
-    "Samba": re.compile(r"\bsamba\b", re.I),
-    "Pagode": re.compile(r"\bpagode\b", re.I),
-    "Lindy Hop": re.compile(r"\blindy\s+hop\b", re.I),
-    "Cha Cha": re.compile(r"\bcha\s*cha(?:\s*cha)?\b", re.I),
+    "Salsa": re.compile(r"\bsalsa\b"),
+    "Bachata": re.compile(r"\bbachata\b"),
+    "Hip-Hop": re.compile(r"\bhip[\s-]?hop\b"),
+    "House": re.compile(r"\bhouse\b"),
+    "Afrobeat": re.compile(r"\bafro[\s-]?beats?\b"),
+    "Zouk": re.compile(r"\bzouk\b"),
+    "Kizomba": re.compile(r"\bkiz(omba)?\b"),
+    "Balboa": re.compile(r"\bbalboa\b"),
+    "Breaking": re.compile(r"\bbreak\s?danc|\bb-boy|\bb-girl"),
+    "East Coast Swing": re.compile(r"\beast\s+coast\s+swing\b|\becs\b"),
+    "West Coast Swing": re.compile(r"\bwest\s+coast\s+swing\b|\bwcs\b"),
+    "Ballroom": re.compile(r"\bballroom\b"),
+    "Hustle": re.compile(r"\bhustle\b"),
+    "Samba": re.compile(r"\bsamba\b"),
+    "Pagode": re.compile(r"\bpagode\b"),
+    "Lindy Hop": re.compile(r"\blindy\s+hop\b"),
+    "Cha Cha": re.compile(r"\bcha\s*cha(?:\s*cha)?\b"),
 }
 
+# All styles as one alternation, one group per style (s0, s1, … in STYLE_REGEX order),
+# so classify_style scans the text once instead of once per style.
+_STYLE_NAMES = tuple(STYLE_REGEX)
+_STYLE_ALT = re.compile(
+    "|".join(f"(?P<s{i}>{pat.pattern})" for i, pat in enumerate(STYLE_REGEX.values()))
+)
+
 AMBIGUOUS = {"Hip-Hop", "House", "Afrobeat", "Balboa", "Breaking", "Hustle", "Samba"}
 WATCH_STYLES = list(STYLE_REGEX.keys())
 
 # ─────────────────── FETCH HELPERS ───────────────────
 
-def fetch_pages(params: Dict[str, Any]) -> List[dict]:
-    """Fetch all pages for given query params (Ticketmaster pagination)."""
+class _RateLimiter:
+    """Spaces calls at least 1/rate seconds apart, across all threads."""
+
+    def __init__(self, rate: float) -> None:
+        self._interval = 1.0 / rate
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self._interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+_rate_limiter = _RateLimiter(TM_MAX_REQ_PER_SEC)
+_seen_lock = threading.Lock()
+
+
+def fetch_pages(params: Dict[str, Any], seen: set[str] | None = None) -> List[dict]:
+    """Fetch all pages for given query params (Ticketmaster pagination).
+
+    If *seen* is given (a set shared by all concurrent fetches), events whose id
+    is already in it are dropped as they arrive and new ids are added to it.
+    """
     events = []
     url = BASE_URL
     while True:
-        data = requests.get(url, params=params, timeout=10).json()
-        events.extend(data.get("_embedded", {}).get("events", []))
+        _rate_limiter.wait()
+        data = orjson.loads(HTTP_CLIENT.get(url, params=params).content)
+        page = data.get("_embedded", {}).get("events", [])
+        if seen is None:
+            events.extend(page)
+        else:
+            with _seen_lock:
+                for ev in page:
+                    if ev["id"] not in seen:
+                        seen.add(ev["id"])
+                        events.append(ev)
         next_href = data.get("_links", {}).get("next", {}).get("href")
         if not next_href:
             break
         url = urljoin("https://app.ticketmaster.com", next_href)
         params = {}
-        time.sleep(0.1)
     return events
 
 
-def fetch_dance_segment() -> List[dict]:
-    return fetch_pages({"apikey": TM_KEY, "classificationName": "Dance", "size": 200, "sort": "date,asc"})
+def fetch_dance_segment(seen: set[str] | None = None) -> List[dict]:
+    return fetch_pages({"apikey": TM_KEY, "classificationName": "Dance", "size": 200, "sort": "date,asc"}, seen)
 
 
-def fetch_style_keyword(style: str) -> List[dict]:
+def fetch_style_keyword(style: str, seen: set[str] | None = None) -> List[dict]:
     kw_override = {
         "Breaking": "breakdance OR b-boy OR b-girl",
         "East Coast Swing": "East Coast Swing OR ECS",
@@ -117,52 +169,93 @@ def fetch_style_keyword(style: str) -> List[dict]:
         "Cha Cha": "Cha Cha OR Cha Cha Cha",
     }
     kw = kw_override.get(style, style)
-    return fetch_pages({"apikey": TM_KEY, "keyword": kw, "size": 200, "sort": "date,asc"})
+    return fetch_pages({"apikey": TM_KEY, "keyword": kw, "size": 200, "sort": "date,asc"}, seen)
 
 # ─────────────────── CLASSIFY & FILTER ───────────────
 
 def segment_is_dance(ev: dict) -> bool:
-    return any(c.get("segment", {}).get("name", "").lower() == "dance" for c in ev.get("classifications", []))
+    for c in ev.get("classifications", []):
+        name = c.get("segment", {}).get("name", "")
+        # First-letter check skips the .lower() for the common Music/Sports/Arts segments
+        if name[:1] in ("d", "D") and name.lower() == "dance":
+            return True
+    return False
 
 
+# Recurring events repeat the same title/description across dates and keyword pages,
+# so the pure text checks below are memoized.
+@lru_cache(maxsize=8192)
 def classify_style(text: str) -> str | None:
-    for name, pat in STYLE_REGEX.items():
-        if pat.search(text):
-            return name
-    return None
+    """Watch style for lowercased *text*, or None."""
+    # The first style in STYLE_REGEX order wins (not the leftmost match), as before.
+    best = None
+    for m in _STYLE_ALT.finditer(text):
+        rank = int(m.lastgroup[1:])
+        if best is None or rank < best:
+            best = rank
+            if rank == 0:
+                break
+    return _STYLE_NAMES[best] if best is not None else None
+
+
+# _text_flags bits
+NOISE, STRONG, HAS_ACTIVITY = 1, 2, 4
+
+
+@lru_cache(maxsize=8192)
+def _text_flags(blob: str) -> int:
+    """Bitmask of the text patterns passes_filters needs for *blob*.
+
+    STRONG is only looked for when NOISE hits, and a NOISE-without-STRONG
+    blob is rejected outright, so ACTIVITY is skipped for it.
+    """
+    flags = 0
+    if PERFORMANCE_NOISE.search(blob):
+        if not STRONG_ACTIVITY_INDICATORS.search(blob):
+            return NOISE
+        flags = NOISE | STRONG
+    if ACTIVITY.search(blob):
+        flags |= HAS_ACTIVITY
+    return flags
 
 
-def passes_filters(ev: dict, style: str | None, title: str, desc: str, venue: str) -> bool:
-    blob = f"{title} {desc}".lower()
-    venue_lower = venue.lower()
+def passes_filters(ev: dict, style: str | None, blob: str, venue_lower: str) -> bool:
+    """*blob* is the lowercased "title description", *venue_lower* the lowercased venue name."""
     seg_dance = segment_is_dance(ev)
+    flags = _text_flags(blob)
 
     # 1. Performance Noise Check (Reverting to stricter: seg_dance alone won't save it)
-    if PERFORMANCE_NOISE.search(blob):
-        # If it looks like a performance, it MUST have STRONG activity indicators to be saved.
-        if not STRONG_ACTIVITY_INDICATORS.search(blob):
-            return False
+    # If it looks like a performance, it MUST have STRONG activity indicators to be saved.
+    if flags & NOISE and not flags & STRONG:
+        return False
+
+    has_activity = bool(flags & HAS_ACTIVITY)
 
     # 2. Venue-based rules (Keeping the more relaxed rule from iteration 31 for THEATRE_ARENA)
     if THEATRE_ARENA.search(venue_lower):
         # Event in a performance venue, allow if TM says it's dance OR it has a general activity word.
-        if not (seg_dance or ACTIVITY.search(blob)):
+        if not (seg_dance or has_activity):
             return False
     
     # 3. Style-specific ambiguity (original logic, using refined ACTIVITY)
-    if style in AMBIGUOUS and not seg_dance and not ACTIVITY.search(blob):
+    if style in AMBIGUOUS and not seg_dance and not has_activity:
         return False
 
     # 4. Final allowance
     # Keep if segment=Dance OR contains (refined) activity OR classified to a watch_style
-    return seg_dance or ACTIVITY.search(blob) is not None or (style in WATCH_STYLES and style is not None and style != "Unknown")
+    return seg_dance or has_activity or (style in WATCH_STYLES and style is not None and style != "Unknown")
 
 # ─────────────────── BUILD ROW ───────────────────────
 
-def build_row(ev: dict) -> Dict[str, Any]:
+def event_fields(ev: dict) -> tuple[str, str, dict]:
+    """(title, description, first venue object) — extracted once per event for filtering and build_row."""
     title = ev.get("name", "")
     desc = ev.get("info") or ev.get("pleaseNote") or ""
     venue_obj = (ev.get("_embedded", {}).get("venues") or [{}])[0]
+    return title, desc, venue_obj
+
+
+def build_row(ev: dict, title: str, desc: str, venue_obj: dict, retrieved_at: str) -> Dict[str, Any]:
     img = next((i for i in ev.get("images", []) if i.get("ratio") in {"16_9", "3_2"}), None) or (ev.get("images") or [{}])[0]
     num = lambda x: float(x) if x and x != "0" else None
     return {
@@ -178,35 +271,57 @@ def build_row(ev: dict) -> Dict[str, Any]:
         "lng": num(venue_obj.get("location", {}).get("longitude")),
         "event_day": ev.get("dates", {}).get("start", {}).get("localDate"),
         "event_time": ev.get("dates", {}).get("start", {}).get("localTime"),
-        "retrieved_at": datetime.now(UTC).isoformat(),
+        "retrieved_at": retrieved_at,
         "source_url": ev.get("url"),
         "raw_when": f"{ev.get('dates', {}).get('start', {}).get('localDate')} {ev.get('dates', {}).get('start', {}).get('localTime')}",
         "image_url": img.get("url"),
     }
 
-# ─────────────────── MAIN PIPELINE ───────────────────
+# ─────────────────── UPSERT ──────────────────────────
 
-def main() -> None:
-    raw_events = fetch_dance_segment()
-    for st in WATCH_STYLES:
-        raw_events.extend(fetch_style_keyword(st))
+def _chunks(seq: List[Any], n: int):
+    for i in range(0, len(seq), n):
+        yield seq[i:i + n]
 
-    print(f"Total raw events pulled: {len(raw_events)}")
 
-    unique_raw = {e["id"]: e for e in raw_events}.values()
+def upsert_rows(rows: List[Dict[str, Any]]) -> None:
+    """Upsert *rows* (already unique by source_id) in UPSERT_CHUNK_SIZE batches, UPSERT_WORKERS at a time."""
+    def _upsert(chunk: List[Dict[str, Any]]) -> None:
+        # returning=minimal: PostgREST skips serializing every upserted row back to us
+        supabase.table('events_ticketmaster').upsert(
+            chunk, on_conflict='source_id', returning=ReturnMethod.minimal
+        ).execute()
+
+    with ThreadPoolExecutor(max_workers=UPSERT_WORKERS) as pool:
+        list(pool.map(_upsert, _chunks(rows, UPSERT_CHUNK_SIZE)))  # list() re-raises chunk errors
+
+# ─────────────────── MAIN PIPELINE ───────────────────
+
+def main() -> None:
+    # Pull the Dance segment and every keyword page in parallel. The fetches share
+    # one seen-id set, so an event returned by several queries is only kept once.
+    seen: set[str] = set()
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        dance_future = pool.submit(fetch_dance_segment, seen)
+        style_pages = pool.map(lambda st: fetch_style_keyword(st, seen), WATCH_STYLES)
+        raw_events = dance_future.result()
+        for events in style_pages:
+            raw_events.extend(events)
+
+    print(f"Total unique events pulled: {len(raw_events)}")
 
     kept_rows: List[Dict[str, Any]] = []
+    retrieved_at = datetime.now(UTC).isoformat()  # one timestamp for the whole run
     per_style_count = {s: 0 for s in WATCH_STYLES}
 
 
-    for ev in unique_raw:
-        title = ev.get("name", "")
-        desc = ev.get("info") or ev.get("pleaseNote") or ""
-        venue = (ev.get("_embedded", {}).get("venues") or [{}])[0].get("name", "")
-        style = classify_style(f"{title} {desc}")
+    for ev in raw_events:
+        title, desc, venue_obj = event_fields(ev)
+        blob = f"{title} {desc}".lower()
+        style = classify_style(blob)
 
-        if passes_filters(ev, style or "Unknown", title, desc, venue):
-            kept_rows.append(build_row(ev))
+        if passes_filters(ev, style or "Unknown", blob, venue_obj.get("name", "").lower()):
+            kept_rows.append(build_row(ev, title, desc, venue_obj, retrieved_at))
             if style in per_style_count:
                 per_style_count[style] += 1
 
@@ -221,12 +336,9 @@ def main() -> None:
         print("No rows to upsert.")
         return
 
-    unique_rows = {r['source_id']: r for r in kept_rows}.values()
-    # Upsert to Supabase
+    # Upsert to Supabase (rows come from unique events, so source_ids are already unique)
     if supabase:
-        supabase.table('events_ticketmaster').upsert(
-            list(unique_rows), on_conflict='source_id'
-        ).execute()
+        upsert_rows(kept_rows)
         print('✅ Upsert complete.')
     else:
         print('Supabase not configured – skipping upsert.')
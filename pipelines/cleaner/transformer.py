@@ -11,24 +11,20 @@ parsed we leave the field `None` rather than raise.
 from __future__ import annotations
 
 import re
-from datetime import datetime, date, time
+from functools import lru_cache
 from typing import Any, Dict, List, Tuple, Optional
-import pytz
 import logging
 
-from dateutil.parser import parse as dt_parse
+import pyarrow as pa
+import pyarrow.compute as pc
+
+logger = logging.getLogger(__name__)
 
 
 # ---------------------------------------------------------------------
 # 1.  REGEX & CONSTANTS
 # ---------------------------------------------------------------------
 
-_PRICE_RE      = re.compile(r"(\d{1,3}(?:[.,]\d{3})*(?:[.,]\d{1,2})?)")
-_CURRENCY_RE   = re.compile(r"(r\$|us?\$|\$|€|£)", re.I)
-
-_LIVE_BAND_RE  = re.compile(r"\b(banda|band|live\s+band|grupo)\b", re.I)
-_CLASS_RE      = re.compile(r"\b(aula|class|work\s*shop|lesson|curso)\b", re.I)
-
 DANCE_STYLE_KEYWORDS = {
     "afrobeat": [r"afrobeat", r"afro-fusion"],
     "argentine tango": [r"argentine tango"],
@@ -61,7 +57,7 @@ DANCE_STYLE_KEYWORDS = {
     "jazz dance": [r"jazz dance"],
     "jive": [r"jive"],
     "k-pop choreography": [r"k[- ]?pop choreography"],
-    "kizomba": [r"kizomba", r"\\bkiz\\b"],
+    "kizomba": [r"kizomba", r"\bkiz\b"],
     "krump": [r"krump"],
     "kuduro": [r"kuduro"],
     "lambada": [r"lambada"],
@@ -79,7 +75,7 @@ DANCE_STYLE_KEYWORDS = {
     "quickstep": [r"quickstep"],
     "rumba": [r"rumba"],
     "reggaeton dance": [r"reggaeton dance"],
-    "samba": [r"samba", r"samba no pé", r"samba de gafieira", r"carnaval"],
+    "samba": [r"samba", r"carnaval"],
     "samba de gafieira": [r"samba de gafieira"],
     "salsa": [r"salsa"],
     "shuffle dance": [r"shuffle dance", r"melbourne shuffle"],
@@ -95,125 +91,190 @@ DANCE_STYLE_KEYWORDS = {
     "pagode": [r"pagode"],
 }
 
+# extract_time_from_raw_when: "8:00 p.m. – 1:00 a.m." / "19:00 – 01:00" style ranges,
+# single times like "7:00 p.m." or "19:00", and bare numbers (usually a day, not a time)
+# The spacing before a meridiem sits inside an optional group that must start one, so a
+# long whitespace run without a range behind it is scanned once, not once per split point
+# (the captures are .strip()ped, so dropping bare trailing spaces from them changes nothing).
+_RAW_WHEN_RANGE_RE = re.compile(
+    r'(\d{1,2}[:h.,]?\d{0,2}(?:\s*(?=[apm.])[ap]?\.?m?\.?)?|\d{1,2})\s*(?:–|to|a|al|até|\'al\'|-)\s*(\d{1,2}[:h.,]?\d{0,2}\s*[ap]?\.?m?\.?|\d{1,2})',
+    re.IGNORECASE,
+)
+_DOTTED_MERIDIEM_RE = re.compile(r'[ap]\.m\.', re.IGNORECASE)
+_RAW_WHEN_SINGLE_RE = re.compile(r'(\d{1,2}[:h.,]\d{2}\s*[ap]?\.?m?\.?|\d{1,2}\s*[ap]\.m\.)', re.IGNORECASE)
+_BARE_NUMBER_RE     = re.compile(r'\b(\d{1,2})\b')
+
+# clean_meridiem / fix_time_format: one alternation each, so every helper is a single
+# pass over the string with the substitution chosen by whichever alternative matched
+_MERIDIEM_FIX_RE = re.compile(
+    r'(?P<full>[ap])[:\.]m[:\.]|(?P<half>[ap])[:\.]m|(?P<spaced>[ap])\s*m|(?P<colword>:+(?=\w))|:+',
+    re.IGNORECASE,
+)
+_TIME_FIX_RE        = re.compile(r'\b(?P<hour>\d{1,2})(?P<minute>\d{2})\b|(?P<dots>\.\.)|\s+')
+
+# normalize_time_am_pm: "8", "8:30", "8 pm", "8:30 p.m." and ranges of two of them.
+# Patterns using \s or \b stay Unicode: Google separates time and meridiem with
+# U+202F, which ASCII \s does not match.  As above, the first meridiem carries its own
+# leading spaces so whitespace before the separator has only one way to match.
+_TIME_RANGE_RE      = re.compile(
+    r'(\d{1,2})(?::(\d{2}))?(?:\s*([ap]\.m\.|[ap]m))?\s*(?:to|–|-)\s*(\d{1,2})(?::(\d{2}))?\s*([ap]\.m\.|[ap]m)?',
+    re.IGNORECASE,
+)
+_SINGLE_TIME_RE     = re.compile(r'(\d{1,2})(?::(\d{2}))?\s*([ap]\.m\.|[ap]m)?', re.IGNORECASE)
+_JUST_NUMBER_RE     = re.compile(r'^(\d{1,2})(:00)?$', re.ASCII)
+# Output already in normalize_time_am_pm's canonical form ("8:00 p.m.", "9:30 p.m. to 1:00 a.m."),
+# which it would return unchanged
+_NORMALIZED_TIME_RE = re.compile(
+    r'(?:1[0-2]|[1-9]):[0-9]{2} [ap]\.m\.(?: to (?:1[0-2]|[1-9]):[0-9]{2} [ap]\.m\.)?'
+)
+# Every spelling the patterns above capture as a meridiem ("am", "P.M.", ...) -> "a.m."/"p.m."
+_AMPM_CANON = {
+    f"{a}{sep}{m}{sep}": f"{a.lower()}.m."
+    for a in "apAP" for m in "mM" for sep in ("", ".")
+}
 
-# ---------------------------------------------------------------------
-# 2.  HELPERS
-# ---------------------------------------------------------------------
-
-def _extract_price(text: str | None) -> Tuple[Optional[int], Optional[int]]:
-    """Return minimum / maximum price found in *text* (integers)."""
-    if not text:
-        return None, None
+# transform_event_data: name/description mentions that mark the event as a concert
+_CONCERT_KEYWORDS = (
+    "concert", "performs live", "band", "show", "live at", "music event", "dj set", "performs on stage", "live performance", "musical performance"
+)
+_CONCERT_RE = re.compile("|".join(map(re.escape, _CONCERT_KEYWORDS)))
+# Genres that keep a concert-like event classed as a dance event
+_ALLOWED_GENRES = frozenset({"bachata", "zouk", "salsa", "pagode"})
+# Columns copied unchanged from *events* into events_clean, in output order
+_PASSTHROUGH_KEYS = (
+    "price", "live_band", "class_before",
+    "venue", "address", "event_day", "country", "city", "lat", "lng", "source_url",
+)
 
-    # drop currency symbols & thousands separators
-    text = _CURRENCY_RE.sub("", text)
-    candidates = [
-        float(t.replace(",", ".")) for t in _PRICE_RE.findall(text)
-    ]
+_REGEX_META = frozenset(".^$*+?{}[]\\|()")
 
-    if not candidates:
-        return None, None
 
-    return int(min(candidates)), int(max(candidates))
+def _is_literal(keyword: str) -> bool:
+    return not _REGEX_META.intersection(keyword)
 
 
-def extract_dance_styles(text: str) -> list:
-    styles = []
-    text_lower = text.lower()
-    for style, keywords in DANCE_STYLE_KEYWORDS.items():
-        for kw in keywords:
-            if re.search(kw, text_lower):
-                styles.append(style)
-                break
-    return styles
+# Pieces of a keyword pattern that a match need not contain: \b, [...] classes and
+# anything made optional by ? or *
+_OPTIONAL_PART_RE = re.compile(r'\\b|\[[^\]]*\][?*+]?|.[?*]')
 
 
-def _combine_date_time(ev_day: Any, ts: Any) -> Optional[datetime]:
-    """
-    *ts* may be:
-        • None
-        • str  -> parsed
-        • datetime
-    If *ts* has no date component we graft *ev_day* on.
-    """
-    if ts is None:
+def _required_literal(keyword: str) -> Optional[str]:
+    """Longest plain substring every match of *keyword* contains (None if unknown)."""
+    pieces = [p for p in _OPTIONAL_PART_RE.split(keyword) if p]
+    if not pieces or not all(_is_literal(p) for p in pieces):
         return None
+    return max(pieces, key=len)
+
+
+def _pattern_prefilter(keywords: List[str]) -> Optional[Tuple[str, ...]]:
+    """Substrings of which at least one must be in the text for any of *keywords*
+    to match; None when some keyword has no usable literal."""
+    literals = tuple(_required_literal(kw) for kw in keywords)
+    return None if None in literals else literals
+
+
+# A style matches if any of its keywords does.  Plain keywords are checked with `in`
+# as flat (keyword, style) pairs; the rest as one compiled alternation per style,
+# only searched once a literal every match must contain is found in the text.
+# (A single all-styles alternation scanned with finditer can't replace these: its
+# matches don't overlap, so "argentine tango" would hide "tango" and "samba de
+# gafieira" would hide "samba".)
+_STYLE_LITERALS: Tuple[Tuple[str, str], ...] = tuple(
+    (kw, style)
+    for style, keywords in DANCE_STYLE_KEYWORDS.items()
+    for kw in keywords if _is_literal(kw)
+)
+_STYLE_PATTERNS: Tuple[Tuple[str, Optional[Tuple[str, ...]], re.Pattern], ...] = tuple(
+    (style, _pattern_prefilter(patterns), re.compile("|".join(patterns)))
+    for style, patterns in (
+        (style, [kw for kw in keywords if not _is_literal(kw)])
+        for style, keywords in DANCE_STYLE_KEYWORDS.items()
+    )
+    if patterns
+)
+# Output order of extract_dance_styles
+_STYLE_ORDER: Tuple[str, ...] = tuple(DANCE_STYLE_KEYWORDS)
+# Every keyword of every style; matches iff at least one style will
+_ANY_STYLE_RE = re.compile("|".join(kw for keywords in DANCE_STYLE_KEYWORDS.values() for kw in keywords))
 
-    if isinstance(ts, str):
-        try:
-            ts = dt_parse(ts)
-        except Exception:
-            return None
-
-    if isinstance(ts, datetime):
-        if ts.date() != datetime.min.date():
-            return ts
-
-        # date is missing ⇒ add event_day
-        if ev_day is None:
-            return None
-        if isinstance(ev_day, str):
-            try:
-                ev_day = dt_parse(ev_day).date()
-            except Exception:
-                return None
-        if isinstance(ev_day, date):
-            return datetime.combine(ev_day, ts.time())
-
-    return None
-
-
-def _format_time_human(dt: datetime) -> str:
-    if not dt:
-        return None
-    # Convert to local time if tz-aware, else use as is
-    if dt.tzinfo:
-        dt = dt.astimezone()
-    hour = dt.hour % 12 or 12
-    ampm = 'a.m.' if dt.hour < 12 else 'p.m.'
-    return f"{hour} {ampm}"
 
+# ---------------------------------------------------------------------
+# 2.  HELPERS
+# ---------------------------------------------------------------------
 
+def extract_dance_styles(text: str) -> list:
+    return extract_dance_styles_lower(text.lower())
+
+
+def extract_dance_styles_lower(text_lower: str) -> list:
+    """`extract_dance_styles` for text the caller has already lowercased."""
+    # One pass over the text rejects the (common) no-keyword case before the per-style
+    # scans, and tells them where to start: no keyword matches before the first hit.
+    first = _ANY_STYLE_RE.search(text_lower)
+    if first is None:
+        return []
+    start = first.start()
+    # Plain keywords carry no context, so a slice is safe for them; patterns (\b ...)
+    # are searched from *start* in the full text to keep their look-behind intact.
+    tail = text_lower[start:] if start else text_lower
+    found = {style for kw, style in _STYLE_LITERALS if kw in tail}
+    found.update(
+        style for style, required, pattern in _STYLE_PATTERNS
+        if style not in found
+        and (required is None or any(lit in tail for lit in required))
+        and pattern.search(text_lower, start)
+    )
+    return [style for style in _STYLE_ORDER if style in found]
+
+
+# The time helpers below are pure str -> str and see the same few dozen values over
+# and over across a batch, so they are memoized (see _log_cache_stats).
+@lru_cache(maxsize=4096)
 def extract_time_from_raw_when(raw_when: str) -> Optional[str]:
-    logger = logging.getLogger(__name__)
     if not raw_when:
         return None
     # Try to find time ranges like "8:00 p.m. – 1:00 a.m." or "19:00 – 01:00" or "8:00 – 9:30 PM"
-    time_range = re.search(r'(\d{1,2}[:h.,]?\d{0,2}\s*[ap]?\.?m?\.?|\d{1,2})\s*(?:–|to|a|al|até|\'al\'|-)\s*(\d{1,2}[:h.,]?\d{0,2}\s*[ap]?\.?m?\.?|\d{1,2})', raw_when, re.IGNORECASE)
+    time_range = _RAW_WHEN_RANGE_RE.search(raw_when)
     if time_range:
         t1 = time_range.group(1).strip()
         t2 = time_range.group(2).strip()
         # Only accept if at least one has a colon or am/pm
-        if (":" in t1 or ":" in t2 or re.search(r'[ap]\.m\.', t1 + t2, re.IGNORECASE)):
+        if ":" in t1 or ":" in t2 or _DOTTED_MERIDIEM_RE.search(t1) or _DOTTED_MERIDIEM_RE.search(t2):
             return f"{t1} to {t2}"
     # Try to find single times like "7:00 p.m." or "19:00"
-    single_time = re.search(r'(\d{1,2}[:h.,]\d{2}\s*[ap]?\.?m?\.?|\d{1,2}\s*[ap]\.m\.)', raw_when, re.IGNORECASE)
+    single_time = _RAW_WHEN_SINGLE_RE.search(raw_when)
     if single_time:
         return single_time.group(1).strip()
     # If only a number is found, ignore it (likely a day, not a time)
-    just_number = re.search(r'\b(\d{1,2})\b', raw_when)
+    just_number = _BARE_NUMBER_RE.search(raw_when)
     if just_number:
-        logger.info(f"Fallback found only a number in raw_when, ignoring as time: {just_number.group(1)} from '{raw_when}'")
+        logger.debug("Fallback found only a number in raw_when, ignoring as time: %s from '%s'", just_number.group(1), raw_when)
         return None
-    logger.warning(f"Fallback failed to extract valid time from raw_when: '{raw_when}'")
+    logger.warning("Fallback failed to extract valid time from raw_when: '%s'", raw_when)
     return None
 
 
+def _meridiem_fix(m: re.Match) -> str:
+    kind = m.lastgroup
+    if kind == 'full':
+        # p:m: / p.m. -> p.m.. (the trailing dot pair is collapsed by fix_time_format)
+        return f"{m.group('full')}.m.."
+    if kind == 'half':
+        return f"{m.group('half')}.m."
+    if kind == 'spaced':
+        return f"{m.group('spaced')}.m."
+    if kind == 'colword':
+        return ''
+    return ':'
+
+
+@lru_cache(maxsize=4096)
 def clean_meridiem(time_str):
     """Fixes p:m: to p.m. and normalizes meridiem, only in the right context."""
     if not time_str:
         return time_str
-    # Replace p:m: or a:m: with p.m. or a.m.
-    time_str = re.sub(r'([ap])[:\.]m[:\.]', r'\1.m.', time_str, flags=re.IGNORECASE)
-    # Replace p:m or a:m with p.m. or a.m.
-    time_str = re.sub(r'([ap])[:\.]m', r'\1.m.', time_str, flags=re.IGNORECASE)
-    # Replace p m or a m with p.m. or a.m.
-    time_str = re.sub(r'([ap])\s*m', r'\1.m.', time_str, flags=re.IGNORECASE)
-    # Remove duplicate colons
-    time_str = re.sub(r':+', ':', time_str)
-    # Remove trailing colons
-    time_str = re.sub(r':\b', '', time_str)
-    return time_str
+    # p:m: / p:m / p m -> p.m., collapse duplicate colons, drop colons running into a word
+    return _MERIDIEM_FIX_RE.sub(_meridiem_fix, time_str)
 
 
 def to_12_hour(hour, minute):
@@ -224,153 +285,199 @@ def to_12_hour(hour, minute):
     return f'{hour12}:{minute:02d} {ampm}'
 
 
+def _to_12h(hour: str, minute: str, ampm: Optional[str]) -> str:
+    """Format regex-captured hour/minute digits as "H:MM a.m.", keeping a captured meridiem."""
+    if not ampm:
+        return to_12_hour(hour, minute)
+    return f"{int(hour) % 12 or 12}:{minute} {_AMPM_CANON[ampm]}"
+
+
+def _time_fix(m: re.Match) -> str:
+    if m.group('minute') is not None:
+        return f"{m.group('hour')}:{m.group('minute')}"
+    if m.group('dots') is not None:
+        return '.'
+    return ' '
+
+
+@lru_cache(maxsize=4096)
 def fix_time_format(time_str):
     """Fixes time strings like '400' to '4:00', removes double periods, and trims whitespace."""
     if not time_str:
         return time_str
-    # Insert colon if missing (e.g., 400 -> 4:00, 930 -> 9:30)
-    time_str = re.sub(r'\b(\d{1,2})(\d{2})\b', r'\1:\2', time_str)
-    # Remove double periods
-    time_str = re.sub(r'\.\.', '.', time_str)
-    # Remove extra spaces
-    time_str = re.sub(r'\s+', ' ', time_str)
-    return time_str.strip()
+    # Insert missing colons (400 -> 4:00, 930 -> 9:30), remove double periods, collapse spaces
+    return _TIME_FIX_RE.sub(_time_fix, time_str).strip()
 
 
+@lru_cache(maxsize=4096)
 def normalize_time_am_pm(time_str: str) -> Optional[str]:
     if not time_str:
         return None
+    # LLM output is usually canonical already
+    if _NORMALIZED_TIME_RE.fullmatch(time_str):
+        return time_str
     # Remove extraneous date text (e.g., 'Thursday, June 19, 1:00 p.m. to Sunday, June 22, 5:00 p.m.')
     # Keep only the time range or single time
-    # Try to extract the last two time-like strings (for ranges)
-    matches = re.findall(r'(\d{1,2})(?::(\d{2}))?\s*([ap]\.m\.|[ap]m)?', time_str)
     # If range
     if 'to' in time_str or '–' in time_str or '-' in time_str:
         # Try to extract two times
-        range_match = re.search(r'(\d{1,2})(?::(\d{2}))?\s*([ap]\.m\.|[ap]m)?\s*(?:to|–|-)\s*(\d{1,2})(?::(\d{2}))?\s*([ap]\.m\.|[ap]m)?', time_str, re.IGNORECASE)
+        range_match = _TIME_RANGE_RE.search(time_str)
         if range_match:
             h1, m1, ampm1, h2, m2, ampm2 = range_match.groups()
             m1 = m1 or '00'
             m2 = m2 or '00'
             # Convert to 12-hour if needed
-            t1 = to_12_hour(h1, m1) if not ampm1 else f"{int(h1)%12 or 12}:{m1} {ampm1.strip('.').lower()}."
-            t2 = to_12_hour(h2, m2) if not ampm2 else f"{int(h2)%12 or 12}:{m2} {ampm2.strip('.').lower()}."
-            result = f"{t1} to {t2}"
+            result = f"{_to_12h(h1, m1, ampm1)} to {_to_12h(h2, m2, ampm2)}"
             return fix_time_format(clean_meridiem(result))
     # If single time
-    single_match = re.match(r'(\d{1,2})(?::(\d{2}))?\s*([ap]\.m\.|[ap]m)?', time_str, re.IGNORECASE)
+    single_match = _SINGLE_TIME_RE.match(time_str)
     if single_match:
         h, m, ampm = single_match.groups()
-        m = m or '00'
-        if ampm:
-            t = f"{int(h)%12 or 12}:{m} {ampm.strip('.').lower()}."
-        else:
-            t = to_12_hour(h, m)
-        return fix_time_format(clean_meridiem(t))
+        return fix_time_format(clean_meridiem(_to_12h(h, m or '00', ampm)))
     # If only a number (e.g., '22:00' or '23'), convert to am/pm
-    just_number = re.match(r'^(\d{1,2})(:00)?$', time_str.strip())
+    just_number = _JUST_NUMBER_RE.match(time_str.strip())
     if just_number:
-        t = just_number.group(1)
-        try:
-            return fix_time_format(clean_meridiem(to_12_hour(t, '00')))
-        except Exception:
-            return time_str
+        # ASCII digits only, so the int() conversions cannot fail
+        return fix_time_format(clean_meridiem(to_12_hour(just_number.group(1), '00')))
     # If nothing matches, return as is
     return fix_time_format(clean_meridiem(time_str.strip()))
 
 
+_CACHED_PARSERS = (
+    extract_time_from_raw_when, clean_meridiem, fix_time_format, normalize_time_am_pm,
+)
+
+
+def _log_cache_stats() -> None:
+    """Log hit/miss counts of the memoized parsers (DEBUG only), to tune cache sizes."""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    for fn in _CACHED_PARSERS:
+        logger.debug("%s cache: %s", fn.__name__, fn.cache_info())
+
+
+def clear_caches() -> None:
+    """Drop every memoized parse, e.g. between batches of a long-running job."""
+    for fn in _CACHED_PARSERS:
+        fn.cache_clear()
+
+
 # ---------------------------------------------------------------------
 # 3.  MAIN ENTRY-POINT
 # ---------------------------------------------------------------------
 
-def transform_event_data(raw: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+def _name_and_description(raw: Dict[str, Any]) -> Tuple[Any, str]:
+    # None-safe; str.strip() hands back the same object when there is nothing to strip
+    return raw.get("name", ""), (raw.get("description") or "").strip()
+
+
+def _match_text(name: Any, description: str) -> str:
+    """name + description, lowercased once for both the style and the concert checks."""
+    return f"{name} {description}".lower()
+
+
+def transform_event_data(
+    raw: Dict[str, Any],
+    is_concert: Optional[bool] = None,
+    styles: Optional[List[str]] = None,
+) -> Optional[Dict[str, Any]]:
     """
     Convert a row from *events* to the target structure expected by
     `events_clean`.  Returns **None** if the record should be skipped.
+    *is_concert* and *styles* may be passed in when already computed for
+    a batch (see `transform_events`).
     """
     if not raw:
         return None
 
-    logger = logging.getLogger(__name__)
-    ev_day = raw.get("event_day")          # may be str or date
+    # ---------- is_dance_event passthrough ---------------------------------
+    # Read first: an LLM verdict (True or False) settles the flag, so only
+    # undecided events reach the concert scan below.  False rows are still
+    # written out, flagged, rather than dropped.
+    is_dance_event = raw.get("is_dance_event")
+    logger.debug("is_dance_event from LLM: %s", is_dance_event)
 
     # ---------- description ------------------------------------------------
-    description = raw.get("description", "").strip()
-    name = raw.get("name", "")
+    name, description = _name_and_description(raw)
     # Log the text being checked for dance styles
-    logger.info(f"Checking dance styles in text: {name} | {description}")
-    styles = extract_dance_styles(f"{name} {description}")
-    logger.info(f"Detected styles: {styles}")
+    logger.debug("Checking dance styles in text: %s | %s", name, description)
+    text_lower = None
+    if styles is None:
+        text_lower = _match_text(name, description)
+        styles = extract_dance_styles_lower(text_lower)
+    logger.debug("Detected styles: %s", styles)
 
     # ---------- times ------------------------------------------------------
-    start_ts = _combine_date_time(ev_day, raw.get("start_time"))
-    end_ts   = _combine_date_time(ev_day, raw.get("end_time"))
     time_str = raw.get("time")  # Expect LLM to provide normalized time
     if not time_str:
         raw_when = raw.get("raw_when", "")
-        logger.info(f"LLM did not provide time. Attempting fallback extraction from raw_when: {raw_when}")
+        logger.debug("LLM did not provide time. Attempting fallback extraction from raw_when: %s", raw_when)
         fallback_time = extract_time_from_raw_when(raw_when)
-        logger.info(f"Fallback extracted time: {fallback_time}")
+        logger.debug("Fallback extracted time: %s", fallback_time)
         time_str = fallback_time
     # Normalize time to am/pm format
     time_str = normalize_time_am_pm(time_str) if time_str else None
     if not time_str:
-        logger.warning(f"Event missing or ambiguous time after normalization. raw_when: {raw.get('raw_when')}, description: {description}, name: {name}")
+        logger.warning("Event missing or ambiguous time after normalization. raw_when: %s, description: %s, name: %s", raw.get('raw_when'), description, name)
     else:
         # Log the final normalized time for debugging
-        logger.info(f"Final normalized time: {time_str}")
-
-    # ---------- flags ------------------------------------------------------
-    live_band    = raw.get("live_band")
-    class_before = raw.get("class_before")
-    price        = raw.get("price")
-
-    # ---------- is_dance_event passthrough ---------------------------------
-    is_dance_event = raw.get("is_dance_event")
-    logger.info(f"is_dance_event from LLM: {is_dance_event}")
+        logger.debug("Final normalized time: %s", time_str)
 
     # ---------- dance event logic ------------------------------------------
-    # Genres to consider as dance events
-    allowed_genres = {"bachata", "zouk", "salsa", "pagode"}
-    # Concert keywords
-    concert_keywords = [
-        "concert", "performs live", "band", "show", "live at", "music event", "dj set", "performs on stage", "live performance", "musical performance"
-    ]
-    text = f"{name} {description}".lower()
-    is_concert = any(kw in text for kw in concert_keywords)
-    # If LLM set is_dance_event, use it
-    if is_dance_event is not None:
-        pass  # Use LLM's value
-    else:
-        # If it's a concert and none of the allowed genres are present, set to False
-        if is_concert and not any(style in allowed_genres for style in styles):
-            is_dance_event = False
-        else:
-            # Otherwise, default to True (unless obviously not a dance event)
+    # If LLM set is_dance_event, use it (and skip the concert scan entirely)
+    if is_dance_event is None:
+        if not _ALLOWED_GENRES.isdisjoint(styles):
+            # An allowed genre keeps it a dance event, concert or not
             is_dance_event = True
+        else:
+            if is_concert is None:
+                # One pass over the text for all concert keywords
+                if text_lower is None:
+                    text_lower = _match_text(name, description)
+                is_concert = _CONCERT_RE.search(text_lower) is not None
+            # If it's a concert, set to False; otherwise default to True
+            is_dance_event = not is_concert
 
     cleaned: Dict[str, Any] = {
         "event_id":  raw.get("id") or raw.get("event_id"),
         "description":      description,
         "name":             name,
         "dance_styles":     styles,
-        "price":            price,
-        "live_band":        live_band,
-        "class_before":     class_before,
-        # NEW passthrough columns ------------------------------------------
-        "venue":            raw.get("venue"),
-        "address":          raw.get("address"),
-        "event_day":        ev_day,
-        "country":          raw.get("country"),
-        "city":             raw.get("city"),
-        # Add lat/lng passthrough
-        "lat":              raw.get("lat"),
-        "lng":              raw.get("lng"),
-        # Add source_url passthrough
-        "source_url":       raw.get("source_url"),
-        "time":             time_str,
-        # Add is_dance_event passthrough
-        "is_dance_event":   is_dance_event,
     }
+    # flags + passthrough columns (event_day may be str or date) -------------
+    cleaned.update(zip(_PASSTHROUGH_KEYS, map(raw.get, _PASSTHROUGH_KEYS)))
+    cleaned["time"] = time_str
+    # Add is_dance_event passthrough
+    cleaned["is_dance_event"] = is_dance_event
 
-    return cleaned 
\ No newline at end of file
+    return cleaned 
+
+
+def transform_events(raws: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Batch form of `transform_event_data`: one result per row of *raws*, in
+    order (None where the row is skipped).  The all-styles gate and the
+    concert check run once over the whole batch as Arrow regex kernels, so
+    per-style extraction only happens for rows that mention some style.
+    """
+    if not raws:
+        return []
+
+    texts = [_match_text(*_name_and_description(raw)) if raw else "" for raw in raws]
+    arr = pa.array(texts, type=pa.large_string())
+    # RE2 treats non-ASCII as non-word for \b, so the gate can only over-match
+    # (never miss) relative to _ANY_STYLE_RE; survivors get the exact per-row scan.
+    may_have_style = pc.match_substring_regex(arr, _ANY_STYLE_RE.pattern).to_pylist()
+    # Rows the LLM already classified never consult the concert flag
+    undecided = [bool(raw) and raw.get("is_dance_event") is None for raw in raws]
+    if any(undecided):
+        is_concert = pc.match_substring_regex(arr, _CONCERT_RE.pattern).to_pylist()
+    else:
+        is_concert = undecided
+
+    cleaned = [
+        transform_event_data(raw, concert, extract_dance_styles_lower(text) if hit else [])
+        for raw, text, hit, concert in zip(raws, texts, may_have_style, is_concert)
+    ]
+    _log_cache_stats()
+    return cleaned
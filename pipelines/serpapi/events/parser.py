@@ -1,8 +1,11 @@
-from typing import Any, Dict, Optional
-from datetime import datetime, timezone, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import date, datetime, timezone, timedelta
+from functools import lru_cache
+import atexit
 import hashlib
 import logging
 import re # Ensure re is imported at the top
+import threading
 
 # Attempt to import dateutil
 try:
@@ -14,44 +17,115 @@ except ImportError:
 # Configure logging (get logger from root or create one)
 logger = logging.getLogger(__name__)
 
+# Unparseable dates are appended here (source_id, start_date, when, error).  The file is
+# opened on the first failure and kept open with a large buffer (flushed at exit), so a
+# page of unparseable dates costs one open() rather than one per event; the lock keeps
+# lines from concurrent parsers whole.
+DATE_FAILURES_PATH = 'data/date_failures.tsv'
+_date_failures_file = None
+_date_failures_lock = threading.Lock()
+
+
+def _log_date_failure(source_id: str, raw_start_date: Any, raw_when: Any, error_msg: str) -> None:
+    global _date_failures_file
+    line = f"{source_id}\t{raw_start_date}\t{raw_when}\t{error_msg}\n"
+    with _date_failures_lock:
+        if _date_failures_file is None:
+            _date_failures_file = open(DATE_FAILURES_PATH, 'a', encoding='utf-8', buffering=1 << 16)
+            atexit.register(_date_failures_file.close)
+        _date_failures_file.write(line)
+
+
 def generate_deterministic_id(link: Optional[str]) -> Optional[str]:
     """Generates an MD5 hash from the event link to use as a stable ID."""
     if link:
-        return hashlib.md5(link.encode('utf-8')).hexdigest()
+        # A dedup key, not a security boundary (also keeps md5 usable on FIPS builds)
+        return hashlib.md5(link.encode('utf-8'), usedforsecurity=False).hexdigest()
     return None
 
-# 1) Map local month abbreviations → English three-letter
-_MONTH_REPLACEMENTS = {
-    r'\bene\.?\b':   'jan',  # enero
-    r'\bfeb\.?\b':   'feb',
-    r'\bmar\.?\b':   'mar',
-    r'\babr\.?\b':   'apr',  # abril / abril
-    r'\bmai\.?\b':   '5',    # maio / mayo 
-    r'\bmay\.?\b':   '5',    # mayo (English/Spanish)
-    r'\bjun\.?\b':   '6',    # junio/junho
-    r'\bjul\.?\b':   '7',
-    r'\bago\.?\b':   '8',    # agosto
-    r'\bsep(?:t)?\.?\b': '9',
-    r'\boct\.?\b':   '10',
-    r'\bnov\.?\b':   '11',
-    r'\bdez\.?\b':   '12',   # dezembro
-    r'\bdic\.?\b':   '12',   # diciembre
+# Local month abbreviations -> English three-letter name or month number
+_MONTH_TOKENS = {
+    'ene': 'jan',   # enero
+    'feb': 'feb',
+    'abr': 'apr',   # abril / abril
+    'mai': '5',     # maio / mayo
+    'may': '5',     # mayo (English/Spanish)
+    'jun': '6',     # junio/junho
+    'jul': '7',
+    'ago': '8',     # agosto
+    'sep': '9',
+    'sept': '9',
+    'oct': '10',
+    'nov': '11',
+    'dez': '12',    # dezembro
+    'dic': '12',    # diciembre
 }
 
-# 2) Strip weekday names in English/Spanish/Portuguese
-_DAY_REPLACEMENTS = [
-    r'\b(dom|domingo)\.?,?', r'\b(lun|lunes)\.?,?', r'\b(mar|martes)\.?,?',
-    r'\b(mi[eé]|miercoles|miércoles)\.?,?', r'\b(jue|jueves)\.?,?',
-    r'\b(vie|viernes)\.?,?', r'\b(sab|s[áa]bado)\.?,?'
-]
+# One left-to-right pass over the string for every token the cleaner rewrites:
+#   day   - weekday names in English/Spanish/Portuguese (stripped).  Listed first, so
+#           "mar" is removed as "martes" the way the month-then-weekday passes always did
+#   mon   - month abbreviations (see _MONTH_TOKENS)
+#   de    - "de" connectors (-> space)
+#   AM/PM markers (stripped)
+# The leading lookahead lists every token's first letter: re uses it to skip ahead to
+# candidate positions instead of trying each alternative at every character.
+_DATE_TOKEN_RE = re.compile(
+    r'(?=[adefjlmnopsv])\b(?:'
+    r'(?P<day>dom|domingo|lun|lunes|mar|martes|mi[eé]|miercoles|miércoles'
+    r'|jue|jueves|vie|viernes|sab|s[áa]bado)\.?,?'
+    r'|(?P<mon>ene|feb|abr|mai|may|jun|jul|ago|sept?|oct|nov|dez|dic)\.?\b'
+    r'|(?P<de>de)\b'
+    r'|[ap]\.?m\.?\b'
+    r')'
+)
+
+# A month or AM/PM marker whose dot runs straight into another token ("ago.mar",
+# "jun.oct", "p.m.sab").  The old pass-per-token cleaner swapped "ago." for "8" before
+# looking for weekdays, so the next token ended up glued on ("8mar") and the later passes
+# never saw it.  A single scan cannot copy that order dependence, so these strings still
+# take the old passes.
+# (Written dot-first, with the token in lookbehinds, so re can scan for the literal '.')
+_DOT_JOINED_TOKEN_RE = re.compile(
+    r'\.(?=[adefjlmnopsv])'
+    r'(?:(?<=\b(?:ene|feb|mar|abr|mai|may|jun|jul|ago|sep|oct|nov|dez|dic)\.)|(?<=\bsept\.)'
+    r'|(?<=\b[ap]m\.)|(?<=\b[ap]\.m\.))'
+)
+_SEQUENTIAL_MONTH_RES = [(re.compile(rf'\b{pat}\.?\b'), repl) for pat, repl in (
+    ('ene', 'jan'), ('feb', 'feb'), ('mar', 'mar'), ('abr', 'apr'), ('mai', '5'),
+    ('may', '5'), ('jun', '6'), ('jul', '7'), ('ago', '8'), ('sep(?:t)?', '9'),
+    ('oct', '10'), ('nov', '11'), ('dez', '12'), ('dic', '12'),
+)]
+_SEQUENTIAL_DAY_RES = [re.compile(rf'\b({pat})\.?,?') for pat in (
+    'dom|domingo', 'lun|lunes', 'mar|martes', 'mi[eé]|miercoles|miércoles',
+    'jue|jueves', 'vie|viernes', 'sab|s[áa]bado',
+)]
+_DE_RE   = re.compile(r'\bde\b')
+_AMPM_RE = re.compile(r'\b[ap]\.?m\.?\b')
+
+# Trailing date-range (everything after "–" or "-")
+_RANGE_RE = re.compile(r'\s*(?:–|-)\s*.*$')
+# Backslash/comma/period/semicolon become spaces, then whitespace runs collapse (str.split)
+_PUNCT_TABLE = str.maketrans(dict.fromkeys('\\,.;', ' '))
+
 
-# 3) Remove "de" connectors and AM/PM markers
-_DE_PATTERN    = r'\bde\b'
-_AMPM_PATTERN  = r'\b[ap]\.?m\.?\b'
+def _date_token(m: re.Match) -> str:
+    mon = m.group('mon')
+    if mon is not None:
+        return _MONTH_TOKENS[mon]
+    return ' ' if m.group('de') is not None else ''
 
-# 4) Remove trailing date-range (everything after "–" or "-")
-_RANGE_PATTERN = r'\s*(?:–|-)\s*.*$'
 
+def _sub_date_tokens_sequentially(s: str) -> str:
+    """Months, then weekdays, then connectors & AM/PM, one pass each (see _DOT_JOINED_TOKEN_RE)."""
+    for cre, repl in _SEQUENTIAL_MONTH_RES:
+        s = cre.sub(repl, s)
+    for cre in _SEQUENTIAL_DAY_RES:
+        s = cre.sub('', s)
+    s = _DE_RE.sub(' ', s)
+    return _AMPM_RE.sub('', s)
+
+
+@lru_cache(maxsize=4096)
 def _clean_date_string_for_parsing(date_str: str) -> str:
     """
     Normalize a raw SerpAPI date string so dateutil.parser.parse()
@@ -59,30 +133,123 @@ def _clean_date_string_for_parsing(date_str: str) -> str:
     """
     s = (date_str or "").lower().strip()
 
-    # 1) months
-    for pat, repl in _MONTH_REPLACEMENTS.items():
-        s = re.sub(pat, repl, s)
+    # 1) months, weekdays, connectors & AM/PM in a single scan (dot-joined tokens: one pass each)
+    if _DOT_JOINED_TOKEN_RE.search(s):
+        s = _sub_date_tokens_sequentially(s)
+    else:
+        s = _DATE_TOKEN_RE.sub(_date_token, s)
+
+    # 2) drop date-range suffix (single dates, the usual case, have no dash to find)
+    if '-' in s or '–' in s:
+        s = _RANGE_RE.sub('', s)
+
+    # 3) strip punctuation & collapse spaces
+    return ' '.join(s.translate(_PUNCT_TABLE).split())
+
+# Whole-string layouts _clean_date_string_for_parsing commonly leaves behind
+# (e.g. "jan 10", "dec 31 2025 20:00", "5/16/2025"); strptime is far cheaper than
+# fuzzy dateutil.  Numeric dates are month-first, as dateutil reads them.
+_FAST_DATE_FORMATS = (
+    "%b %d", "%b %d %Y", "%b %d %H:%M", "%b %d %Y %H:%M",
+    "%m/%d/%Y", "%m/%d/%Y %H:%M",
+)
+
+# Month-number + day the cleaner makes of "16 de mai" / "may 16" ("5 16 ..."), and a clock time
+_MONTH_DAY_RE = re.compile(r'([0-9]{1,2})\s+([0-9]{1,2})')   # ASCII, as strptime took it
+_CLOCK_RE     = re.compile(r'(\d{1,2}):(\d{2})')
+
+
+def _fast_parse(date_str: str, year: int) -> Optional[datetime]:
+    """Parse *date_str* with one of _FAST_DATE_FORMATS, or return None.
+    Year-less layouts get *year* (the current year, as dateutil's default does)."""
+    for fmt in _FAST_DATE_FORMATS:
+        try:
+            dt = datetime.strptime(date_str, fmt)
+        except ValueError:
+            continue
+        return dt if "%Y" in fmt else dt.replace(year=year)
+    return None
+
+
+# SerpAPI repeats the same start_date/when pairs across a page (one venue's
+# schedule, one weekend), so the parse is memoized on the raw pair plus the
+# local date the year/day defaults come from; results are immutable strings.
+@lru_cache(maxsize=8192)
+def _parse_dates(raw_start_date: str, raw_when: str, today: date) -> Tuple[Optional[str], Optional[str]]:
+    """(event_day, start_time) parsed from SerpAPI's start_date and when strings;
+    either is None when it cannot be determined.  Raises on non-string input."""
+    event_day = None
+    start_time = None
+
+    # Apply our cleaning function to both date strings
+    cleaned_start = _clean_date_string_for_parsing(raw_start_date)
+    cleaned_when = _clean_date_string_for_parsing(raw_when)
+
+    # Combine the two cleaned strings for best chance of parsing
+    # 'when' often has time info that 'start_date' doesn't
+    date_parts = []
+    if cleaned_start:
+        date_parts.append(cleaned_start)
+    if cleaned_when:
+        date_parts.append(cleaned_when)
+
+    # Combine them with space so dateutil can parse better
+    combined_date_str = ' '.join(date_parts).strip()
+
+    logger.debug("Attempting to parse date: '%s' (from '%s' and '%s')", combined_date_str, raw_start_date, raw_when)
+
+    if combined_date_str:
+        # Special handling for our numeric month format
+        # Look for patterns like "5 16" (month day) in the current year
+        match = _MONTH_DAY_RE.match(combined_date_str)
+        if match:
+            month, day = match.groups()
+            try:
+                event_day = date(today.year, int(month), int(day)).isoformat()
+
+                # Try to extract time from the remaining string
+                time_match = _CLOCK_RE.search(combined_date_str)
+                if time_match:
+                    hour, minute = time_match.groups()
+                    start_time = f"{int(hour):02d}:{minute}"
+                logger.debug("Successfully parsed numeric date: %s %s", event_day, start_time)
+            except Exception as e:
+                logger.warning("Error parsing numeric date pattern: %s", e)
+                # Fall through to standard parsing below
+
+        # If we don't have event_day yet, try standard dateutil parsing
+        if not event_day:
+            try:
+                # Standard dateutil parsing, after the cheap exact-format attempts
+                dt = _fast_parse(combined_date_str, today.year) or dateutil_parser.parse(
+                    combined_date_str, fuzzy=True, default=datetime.combine(today, datetime.min.time())
+                )
 
-    # 2) weekdays
-    for pat in _DAY_REPLACEMENTS:
-        s = re.sub(pat, '', s)
+                # Set the event_day (date portion only)
+                event_day = dt.date().isoformat()
 
-    # 3) connectors & AM/PM
-    s = re.sub(_DE_PATTERN, ' ', s)
-    s = re.sub(_AMPM_PATTERN, '', s)
+                # Set start_time (time portion in HH:MM format)
+                if dt.hour != 0 or dt.minute != 0:  # Only set if we have a non-midnight time
+                    start_time = f"{dt.hour:02d}:{dt.minute:02d}"
 
-    # 4) drop date-range suffix
-    s = re.sub(_RANGE_PATTERN, '', s)
+                logger.debug("Successfully parsed date: %s %s", event_day, start_time)
+            except Exception as e:
+                logger.warning("Dateutil parse error: %s", e)
 
-    # 5) strip punctuation & collapse spaces
-    s = re.sub(r'[\\,\\.\\;]', ' ', s)
-    s = re.sub(r'\s+', ' ', s).strip()
+    return event_day, start_time
 
-    return s
 
-def parse_event_result(event_data: Dict, city_info: Dict = None) -> Optional[Dict]:
+def parse_event_result(
+    event_data: Dict,
+    city_info: Dict = None,
+    now_utc: Optional[datetime] = None,
+    today: Optional[date] = None,
+) -> Optional[Dict]:
     """Parses a raw event dictionary from SerpAPI into our standardized format.
-    Returns None if the event should be excluded."""
+    Returns None if the event should be excluded.
+    *now_utc* stamps `retrieved_at` and *today* (local date) fills in missing
+    date parts; pass one value of each for a whole page of results instead of
+    reading the clock per event."""
 
     # 1. Basic validation - must have a name at minimum
     if not event_data.get('title'):
@@ -95,7 +262,7 @@ def parse_event_result(event_data: Dict, city_info: Dict = None) -> Optional[Dic
 
     # Skip events without valid source ID (rare, but possible)
     if not source_id:
-        logger.warning(f"Cannot generate source_id for event: {event_data.get('title')}")
+        logger.warning("Cannot generate source_id for event: %s", event_data.get('title'))
         return None
 
     # 3. Try to parse dates
@@ -108,132 +275,57 @@ def parse_event_result(event_data: Dict, city_info: Dict = None) -> Optional[Dic
     start_time = None
     
     try:
-        # Apply our cleaning function to both date strings
-        cleaned_start = _clean_date_string_for_parsing(raw_start_date)
-        cleaned_when = _clean_date_string_for_parsing(raw_when)
-        
-        # Combine the two cleaned strings for best chance of parsing
-        # 'when' often has time info that 'start_date' doesn't
-        date_parts = []
-        if cleaned_start:
-            date_parts.append(cleaned_start)
-        if cleaned_when:
-            date_parts.append(cleaned_when)
-            
-        # Combine them with space so dateutil can parse better
-        combined_date_str = ' '.join(date_parts).strip()
-        
-        logger.debug(f"Attempting to parse date: '{combined_date_str}' (from '{raw_start_date}' and '{raw_when}')")
-        
-        if combined_date_str:
-            # Special handling for our numeric month format
-            # Look for patterns like "5 16" (month day) and convert to "5/16/2024"
-            month_day_pattern = r'(\d{1,2})\s+(\d{1,2})'
-            match = re.match(month_day_pattern, combined_date_str)
-            if match:
-                month, day = match.groups()
-                year = datetime.now().year  # Current year
-                reformatted_date = f"{month}/{day}/{year}"
-                try:
-                    dt = datetime.strptime(reformatted_date, "%m/%d/%Y")
-                    event_day = dt.date().isoformat()
-                    
-                    # Try to extract time from the remaining string
-                    time_pattern = r'(\d{1,2}):(\d{2})'
-                    time_match = re.search(time_pattern, combined_date_str)
-                    if time_match:
-                        hour, minute = time_match.groups()
-                        start_time = f"{int(hour):02d}:{minute}"
-                    logger.debug(f"Successfully parsed numeric date: {event_day} {start_time}")
-                except Exception as e:
-                    logger.warning(f"Error parsing numeric date pattern: {e}")
-                    # Fall through to standard parsing below
-            
-            # If we don't have event_day yet, try standard dateutil parsing
-            if not event_day:
-                try:
-                    # Standard dateutil parsing
-                    dt = dateutil_parser.parse(combined_date_str, fuzzy=True)
-                    
-                    # Set the event_day (date portion only)
-                    event_day = dt.date().isoformat()
-                    
-                    # Set start_time (time portion in HH:MM format)
-                    if dt.hour != 0 or dt.minute != 0:  # Only set if we have a non-midnight time
-                        start_time = f"{dt.hour:02d}:{dt.minute:02d}"
-                        
-                    logger.debug(f"Successfully parsed date: {event_day} {start_time}")
-                except Exception as e:
-                    logger.warning(f"Dateutil parse error: {e}")
+        event_day, start_time = _parse_dates(raw_start_date, raw_when, today or date.today())
     except Exception as e:
         # If parsing fails, log it but allow event to proceed with nulls
         error_msg = str(e)
-        logger.warning(f"Date parsing error for event '{event_data.get('title')}': {error_msg}")
+        logger.warning("Date parsing error for event '%s': %s", event_data.get('title'), error_msg)
         
         # Log to date_failures.tsv
         try:
-            with open('data/date_failures.tsv', 'a', encoding='utf-8') as f:
-                f.write(f"{source_id}\t{raw_start_date}\t{raw_when}\t{error_msg}\n")
+            _log_date_failure(source_id, raw_start_date, raw_when, error_msg)
         except Exception as log_error:
-            logger.error(f"Error logging date failure: {log_error}")
+            logger.error("Error logging date failure: %s", log_error)
     
     # 4. Construct the standardized event record
-    event_record = {
-        "source_id": source_id,
-        "source_url": link,
-        "source_platform": "serpapi_google_events",
-        "retrieved_at": datetime.now(timezone.utc).isoformat(),
-        "name": event_data.get('title'),
-        "description": event_data.get('description', ''),
-        "event_day": event_day,  # Will be None if parsing failed
-        "raw_when": raw_when, 
-        "venue": event_data.get('venue', {}).get('name'),
-        "address": event_data.get('address', []),
-    }
-
-    # --- Extract Venue/Location ---
     venue_data = event_data.get("venue", {})
-    venue = venue_data.get("name")
     address_list = event_data.get("address", []) # SerpApi often returns address as a list
-    address = ", ".join(address_list) if isinstance(address_list, list) else address_list
-    
+
     lat, lng = None, None
-    location_info = event_data.get("location_info", {})
     gps_coords = event_data.get("gps_coordinates") or venue_data.get("coordinates") # Check both fields
     if gps_coords and isinstance(gps_coords, dict):
         lat = gps_coords.get("latitude")
         lng = gps_coords.get("longitude")
-    # Attempt fallback from link if lat/lng still missing (less reliable)
-    # if lat is None and link and "google.com/maps/search/" in link:
-        # try: # Example, might need refinement
-        #     coords_part = link.split('@')[1].split(',')
-        #     lat = float(coords_part[0])
-        #     lng = float(coords_part[1])
-        # except Exception:
-        #     pass # Ignore parsing errors
-
-    # --- Assemble Final Record ---
-    # Only 'name' and 'source_id' are strictly critical now for initial ingestion.
-    # source_id is derived from link, so check name and link.
-    if not event_data.get('title'): # Link check is implicitly handled by source_id check earlier
-         logger.warning(f"Skipping event because 'name' is missing. Link: {link}")
-         return None
-
-    event_record.update({
+
+    event_record = {
+        "source_id": source_id,
+        "source_url": link,
+        "source_platform": "serpapi_google_events",
+        "retrieved_at": (now_utc or datetime.now(timezone.utc)).isoformat(),
+        "name": event_data.get('title'),
+        "description": event_data.get('description', ''),
+        "event_day": event_day,  # Will be None if parsing failed
+        "raw_when": raw_when,
         # Location Info
-        "venue": venue,
-        "address": address, 
+        "venue": venue_data.get("name"),
+        "address": ", ".join(address_list) if isinstance(address_list, list) else address_list,
         "city": city_info.get("name"),
         "country": city_info.get("country_code"),
         "lat": lat,
         "lng": lng,
-    })
-    
-    # Remove ticket_info_raw from event_record if present
-    if 'ticket_info_raw' in event_record:
-        del event_record['ticket_info_raw']
-    
-    logger.debug(f"Successfully parsed event: {source_id} - {event_data.get('title')[:50]}...")
+    }
+
+    logger.debug("Successfully parsed event: %s - %.50s...", source_id, event_data.get('title'))
     return event_record
 
-# Removed old if __name__ == '__main__': block 
\ No newline at end of file
+
+def parse_event_results(events: List[Dict], city_info: Dict = None, now_utc: Optional[datetime] = None) -> List[Optional[Dict]]:
+    """Batch form of `parse_event_result` for one page of SerpAPI results: one
+    entry per event, in order (None where the event is excluded).  The page
+    shares one `retrieved_at` and one local date, and repeated date strings are
+    parsed once."""
+    if now_utc is None:
+        now_utc = datetime.now(timezone.utc)
+    today = date.today()
+    return [parse_event_result(event, city_info, now_utc, today) for event in events]
+ 
\ No newline at end of file
@@ -1,6 +1,7 @@
 import os
 import base64
 import time
+from functools import lru_cache
 from dotenv import load_dotenv
 import logging
 
@@ -25,11 +26,18 @@ DEFAULT_PARAMS = {
     "google_domain": "google.com", # Keep google_domain default
 }
 
+# UULE timestamps are quantized to this many seconds, so a city's UULE (and thus
+# the request URL) stays stable across the requests of one run
+UULE_TIMESTAMP_BUCKET_S = 3600
+
 def _generate_uule_v2(latitude: float, longitude: float) -> str:
     """Generates a Google UULE v2 string from latitude and longitude."""
-    lat_e7 = int(latitude * 10**7)
-    lon_e7 = int(longitude * 10**7)
-    timestamp_us = int(time.time() * 10**6) # Microseconds
+    # Integer keys: float-keyed caches miss on tiny precision differences
+    return _uule_v2(int(latitude * 10**7), int(longitude * 10**7), int(time.time() // UULE_TIMESTAMP_BUCKET_S))
+
+@lru_cache(maxsize=1024)
+def _uule_v2(lat_e7: int, lon_e7: int, ts_bucket: int) -> str:
+    timestamp_us = ts_bucket * UULE_TIMESTAMP_BUCKET_S * 10**6 # Microseconds
 
     uule_inner_string = (
         f"role:1\n"
@@ -74,16 +82,14 @@ def build_params(city_row: dict) -> dict:
     # Generate UULE string from lat/lon using our new function
     uule_string = _generate_uule_v2(latitude=lat, longitude=lon)
 
-    params = DEFAULT_PARAMS.copy()
-    params.update({
+    return {
+        **DEFAULT_PARAMS,
         "uule": uule_string,
         "hl": str(city_row['hl']),
         "gl": str(city_row['gl']),
         # "q" and "api_key" are already in DEFAULT_PARAMS
         # start/num will be added by the runner for pagination
-    })
-
-    return params
+    }
 
 # Example Usage (for testing)
 if __name__ == "__main__":
@@ -3,10 +3,12 @@ import sys
 import logging
 import json
 import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from dotenv import load_dotenv
 from supabase import create_client, Client
 from pipelines.serpapi.events.qwen_cleaner import enrich_event_with_llm
-from pipelines.cleaner.transformer import transform_event_data
+from pipelines.cleaner.transformer import transform_event_data, transform_events
 
 # Setup logging
 logging.basicConfig(
@@ -30,6 +32,11 @@ if not SUPABASE_URL or not SUPABASE_KEY:
     logger.error("SUPABASE_URL and SUPABASE_KEY must be set in the environment or .env file.")
     sys.exit(1)
 
+# Events are transformed and upserted this many at a time
+UPSERT_BATCH_SIZE = 500
+# Concurrent LLM enrichment requests
+LLM_WORKERS = int(os.getenv("LLM_WORKERS", 8))
+
 def get_all_events(supabase: Client):
     try:
         response = supabase.table('events').select('*').range(0, 9999).execute()
@@ -41,10 +48,14 @@ def get_all_events(supabase: Client):
         return []
 
 def upsert_event_clean_with_retry(supabase: Client, event_clean: dict, max_retries=3, delay=2):
+    return upsert_events_clean_with_retry(supabase, [event_clean], max_retries, delay)
+
+def upsert_events_clean_with_retry(supabase: Client, events_clean: list, max_retries=3, delay=2):
+    for event_clean in events_clean:
+        event_clean.pop('end_time', None)
     for attempt in range(1, max_retries + 1):
         try:
-            event_clean.pop('end_time', None)
-            response = supabase.table('events_clean').upsert(event_clean, on_conflict='event_id').execute()
+            response = supabase.table('events_clean').upsert(events_clean, on_conflict='event_id').execute()
             if hasattr(response, 'data') and response.data:
                 return True, None
             else:
@@ -68,6 +79,99 @@ def save_failed_event(event, error):
     except Exception as e:
         logger.error(f"Failed to save failed event: {e}")
 
+def _batched(iterable, size):
+    it = iter(iterable)
+    while batch := list(islice(it, size)):
+        yield batch
+
+def _enrich_one(event):
+    """Enrich one event with the LLM; returns (event, error) so failures stay per event."""
+    event_id = event.get('id') or event.get('source_id')
+    try:
+        logger.info(f"\n--- Processing Event ---\nID: {event_id}\nName: {event.get('name')}\nDescription: {event.get('description')}\nRaw_when: {event.get('raw_when')}\nTime: {event.get('time')}")
+        # Step 1: Enrich event with LLM (description, live_band, class_before, is_dance_event)
+        if event.get('description'):
+            event_llm = enrich_event_with_llm(event)
+            logger.info(f"LLM Output for Event {event_id}: {event_llm}")
+            event = event_llm
+        return event, None
+    except Exception as e:
+        return event, e
+
+def enrich_events(events, failed_events_summary):
+    """Yield events in their original order, LLM-enriched when they have a description.
+    The LLM calls are network-bound, so LLM_WORKERS of them are in flight at once.
+    Events whose enrichment raises are logged, saved and left out."""
+    with ThreadPoolExecutor(max_workers=LLM_WORKERS) as pool:
+        for event, error in pool.map(_enrich_one, events):
+            if error is not None:
+                event_id = event.get('id') or event.get('source_id')
+                logger.error(f"Failed to process event {event_id}: {error}. Data: {event}")
+                save_failed_event(event, str(error))
+                failed_events_summary.append({'id': event_id, 'name': event.get('name'), 'reason': f'Exception: {error}'})
+                continue
+            yield event
+
+def transform_batch(batch, failed_events_summary):
+    """Step 2: Clean/transform a batch of enriched events into (event, cleaned) pairs ready to upsert."""
+    try:
+        cleaned_batch = transform_events(batch)
+    except Exception:
+        # Fall back to one event at a time so a single bad row only fails itself
+        kept, cleaned_batch = [], []
+        for event in batch:
+            try:
+                cleaned = transform_event_data(event)
+            except Exception as e:
+                logger.error(f"Failed to process event {event.get('id') or event.get('source_id')}: {e}. Data: {event}")
+                save_failed_event(event, str(e))
+                failed_events_summary.append({'id': event.get('id') or event.get('source_id'), 'name': event.get('name'), 'reason': f'Exception: {e}'})
+                continue
+            kept.append(event)
+            cleaned_batch.append(cleaned)
+        batch = kept
+    pairs = []
+    for event, cleaned in zip(batch, cleaned_batch):
+        event_id = event.get('id') or event.get('source_id')
+        event_name = event.get('name')
+        logger.info(f"Cleaned Event for {event_id}: {cleaned}")
+        if not cleaned:
+            logger.warning(f"Transformer returned None for event: {event_id}. Proceeding to upsert anyway.")
+            cleaned = event  # Use the event as-is if transformer returns None
+        # Always ensure event_id is present before upsert
+        cleaned['event_id'] = cleaned.get('event_id') or cleaned.get('id') or cleaned.get('source_id')
+        if not cleaned['event_id']:
+            logger.warning(f"Event missing event_id: {event_id} - {event_name}. Data: {cleaned}")
+        # Log if time is missing
+        if not cleaned.get('time'):
+            logger.warning(f"Event missing time: {event_id} - {event_name}. LLM output: {event}")
+        # Ensure is_dance_event is always present (True/False/None)
+        if 'is_dance_event' not in cleaned:
+            cleaned['is_dance_event'] = None
+        pairs.append((event, cleaned))
+    return pairs
+
+def upsert_batch(supabase: Client, pairs, failed_events_summary):
+    """Step 3: Upsert a batch to events_clean with retry; returns how many rows made it.
+    If the batch as a whole fails, each event is retried alone to isolate the bad rows."""
+    logger.info(f"Upserting {len(pairs)} events")
+    success, upsert_error = upsert_events_clean_with_retry(supabase, [cleaned for _, cleaned in pairs])
+    if success:
+        return len(pairs)
+    logger.warning(f"Batch upsert failed: {upsert_error}. Retrying events one at a time.")
+    upserted = 0
+    for event, cleaned in pairs:
+        event_id = event.get('id') or event.get('source_id')
+        logger.info(f"Upserting event: {event_id} - {cleaned.get('name')}")
+        success, upsert_error = upsert_event_clean_with_retry(supabase, cleaned)
+        if success:
+            upserted += 1
+        else:
+            logger.warning(f"Upsert failed for event: {event_id}. Error: {upsert_error}. Data: {cleaned}")
+            save_failed_event(cleaned, upsert_error)
+            failed_events_summary.append({'id': event_id, 'name': event.get('name'), 'reason': f'Upsert failed: {upsert_error}'})
+    return upserted
+
 def main():
     supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
     events = get_all_events(supabase)
@@ -75,51 +179,15 @@ def main():
     logger.info(f"Event IDs: {[e.get('id') or e.get('source_id') for e in events]}")
     total_processed = 0
     total_upserted = 0
-    total_failed = 0
     failed_events_summary = []  # Collect all failed events and reasons
     logger.info(f"Processing {len(events)} events")
-    for event in events:
-        try:
-            event_id = event.get('id') or event.get('source_id')
-            event_name = event.get('name')
-            logger.info(f"\n--- Processing Event ---\nID: {event_id}\nName: {event_name}\nDescription: {event.get('description')}\nRaw_when: {event.get('raw_when')}\nTime: {event.get('time')}")
-            # Step 1: Enrich event with LLM (description, live_band, class_before, is_dance_event)
-            if event.get('description'):
-                event_llm = enrich_event_with_llm(event)
-                logger.info(f"LLM Output for Event {event_id}: {event_llm}")
-                event = event_llm
-            # Step 2: Clean/transform event
-            cleaned = transform_event_data(event)
-            logger.info(f"Cleaned Event for {event_id}: {cleaned}")
-            if not cleaned:
-                logger.warning(f"Transformer returned None for event: {event_id}. Proceeding to upsert anyway.")
-                cleaned = event  # Use the event as-is if transformer returns None
-            # Always ensure event_id is present before upsert
-            cleaned['event_id'] = cleaned.get('event_id') or cleaned.get('id') or cleaned.get('source_id')
-            if not cleaned['event_id']:
-                logger.warning(f"Event missing event_id: {event_id} - {event_name}. Data: {cleaned}")
-            # Log if time is missing
-            if not cleaned.get('time'):
-                logger.warning(f"Event missing time: {event_id} - {event_name}. LLM output: {event}")
-            # Step 3: Upsert to events_clean with retry
-            # Ensure is_dance_event is always present (True/False/None)
-            if 'is_dance_event' not in cleaned:
-                cleaned['is_dance_event'] = None
-            logger.info(f"Upserting event: {event_id} - {cleaned.get('name')}")
-            success, upsert_error = upsert_event_clean_with_retry(supabase, cleaned)
-            if success:
-                total_upserted += 1
-            else:
-                logger.warning(f"Upsert failed for event: {event_id}. Error: {upsert_error}. Data: {cleaned}")
-                save_failed_event(cleaned, upsert_error)
-                failed_events_summary.append({'id': event_id, 'name': event_name, 'reason': f'Upsert failed: {upsert_error}'})
-                total_failed += 1
-            total_processed += 1
-        except Exception as e:
-            logger.error(f"Failed to process event {event.get('id') or event.get('source_id')}: {e}. Data: {event}")
-            save_failed_event(event, str(e))
-            failed_events_summary.append({'id': event.get('id') or event.get('source_id'), 'name': event.get('name'), 'reason': f'Exception: {e}'})
-            total_failed += 1
+    # Enriched events stream through in batches: only one batch of cleaned rows is held at a time
+    for batch in _batched(enrich_events(events, failed_events_summary), UPSERT_BATCH_SIZE):
+        pairs = transform_batch(batch, failed_events_summary)
+        total_processed += len(pairs)
+        if pairs:
+            total_upserted += upsert_batch(supabase, pairs, failed_events_summary)
+    total_failed = len(failed_events_summary)
     # Log a summary of all failed events and reasons
     if failed_events_summary:
         logger.info("\n==== Failed Events Report ====")
@@ -24,7 +24,7 @@ sys.path.insert(0, project_root)
 # Import pipeline components (adjust paths if needed based on execution context)
 try:
     from pipelines.serpapi.events.request_builder import build_params
-    from pipelines.serpapi.events.parser import parse_event_result
+    from pipelines.serpapi.events.parser import parse_event_results
     from pipelines.serpapi.events.places_enricher import enrich_with_places
 except ImportError as e:
     print(f"Error importing pipeline modules: {e}")
@@ -197,8 +197,8 @@ def should_fetch_next_page(events, max_events=10, days_window=7, threshold=0.8):
     week_later = now + timedelta(days=days_window)
     in_window = [
         e for e in events
-        if 'event_day' in e and e['event_day']
-        and now <= datetime.strptime(e['event_day'], '%Y-%m-%d') <= week_later
+        if e and e.get('event_day')
+        and now <= datetime.fromisoformat(e['event_day']) <= week_later  # event_day is date.isoformat()
     ]
     return len(in_window) / len(events) >= threshold
 
@@ -320,13 +320,14 @@ def main():
                 break # No more events for this city
 
             logging.info(f"Found {len(events_on_page)} events on page {current_page + 1} for {city_info['name']}.")
+            # Parse the page once; smart pagination below reuses the results
+            parsed_page = parse_event_results(events_on_page, city_info=city_info)
 
-            for event_item in events_on_page:
+            for event_item, parsed_event_data in zip(events_on_page, parsed_page):
                 if events_fetched_for_city >= args.max_events:
                     logging.info(f"Reached max events ({args.max_events}) for city {city_info['name']}.")
                     break # Break from inner for loop
 
-                parsed_event_data = parse_event_result(event_item, city_info=city_info)
                 if not parsed_event_data:
                     logging.warning(f"Could not parse event item: {event_item.get('title', 'Unknown Event')}")
                     continue
@@ -382,7 +383,7 @@ def main():
                 break # Break from while loop (pagination)
 
             # --- SMART PAGINATION: Only fetch next page if most events are soon ---
-            if not should_fetch_next_page([parse_event_result(e, city_info=city_info) for e in events_on_page]):
+            if not should_fetch_next_page(parsed_page):
                 logging.info(f"Smart pagination: Not fetching next page for {city_info['name']} (not enough near-term events).")
                 break
 
@@ -1,9 +1,12 @@
 import os
 import sys
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from supabase import create_client, Client
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 
 # Load environment variables
@@ -26,6 +29,20 @@ logger = logging.getLogger(__name__)
 # Google Places API endpoint
 PLACES_API_URL = "https://maps.googleapis.com/maps/api/place/findplacefromtext/json"
 DETAILS_API_URL = "https://maps.googleapis.com/maps/api/place/details/json"
+PLACES_TIMEOUT = 10  # seconds
+PLACES_WORKERS = int(os.getenv("PLACES_WORKERS", 8))
+
+# Both Places calls of every event go through one pooled keep-alive session, so each
+# request doesn't pay for a new TCP+TLS handshake; transient 429/5xx replies are retried
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(
+        total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504],
+        raise_on_status=False,  # hand the last reply back, as a plain get() would
+    ),
+))
 
 def get_cached_place(query):
     response = supabase.table("places_cache").select("*").eq("query", query).execute()
@@ -55,7 +72,7 @@ def find_venue_from_address(address):
         "fields": "place_id",
         "key": GOOGLE_PLACES_API_KEY
     }
-    resp = requests.get(PLACES_API_URL, params=params)
+    resp = _SESSION.get(PLACES_API_URL, params=params, timeout=PLACES_TIMEOUT)
     data = resp.json()
     if data.get("status") == "OK" and data.get("candidates"):
         return data["candidates"][0]["place_id"]
@@ -67,7 +84,7 @@ def get_place_details(place_id):
         "fields": "place_id,name,formatted_address,geometry,types,business_status",
         "key": GOOGLE_PLACES_API_KEY
     }
-    resp = requests.get(DETAILS_API_URL, params=params)
+    resp = _SESSION.get(DETAILS_API_URL, params=params, timeout=PLACES_TIMEOUT)
     data = resp.json()
     if data.get("status") == "OK" and data.get("result"):
         result = data["result"]
@@ -99,22 +116,18 @@ def update_event_venue_and_address(event_id, venue, address, lat, lng):
 def is_missing_venue(venue):
     return not venue or str(venue).strip() == "" or venue == "__VENUE_UNKNOWN__"
 
-def main():
-    events = get_all_events()
-    logger.info(f"Found {len(events)} events to process.")
-    for event in events:
+def enrich_address_events(original_serp_address, address_events):
+    """Enrich every event sharing *original_serp_address*, in order: one places_cache
+    lookup and at most one Google Places resolution for the whole group."""
+    # 1. Check places_cache first
+    cached = get_cached_place(original_serp_address)
+    asked_google = False
+    for event in address_events:
         event_id = event["id"]
-        original_serp_address = event["address"]
         event_venue = event["venue"]
 
         logger.info(f"Processing event {event_id}: Venue='{event_venue}', Address='{original_serp_address}'")
 
-        if not original_serp_address:
-            logger.warning(f"Skipping event {event_id} due to missing address.")
-            continue
-
-        # 1. Check places_cache first
-        cached = get_cached_place(original_serp_address)
         if cached:
             logger.info(f"Cache hit for address: {original_serp_address}")
             final_venue = cached["venue"] if event_venue == "__VENUE_UNKNOWN__" else event_venue
@@ -125,6 +138,11 @@ def main():
                 logger.error(f"Failed to update event {event_id} from cache")
             continue
 
+        if asked_google:
+            logger.info(f"Skipping event {event_id}: no place found earlier in this run for address: {original_serp_address}")
+            continue
+        asked_google = True
+
         # 2. Not in cache, call Google Places API
         logger.info(f"Cache miss for address: {original_serp_address}. Calling Google Places API.")
         place_id = find_venue_from_address(original_serp_address)
@@ -143,7 +161,7 @@ def main():
         google_lat = details["lat"]
         google_lng = details["lng"]
 
-        # 4. Cache the result
+        # 4. Cache the result (later events with this address reuse the same row)
         cache_place(
             details["place_id"],
             original_serp_address,
@@ -154,6 +172,12 @@ def main():
             details["types"],
             details["business_status"]
         )
+        cached = {
+            "venue": final_venue,
+            "address": google_formatted_address,
+            "lat": google_lat,
+            "lng": google_lng,
+        }
         logger.info(f"Cached place for query='{original_serp_address}': venue='{final_venue}', address='{google_formatted_address}'")
 
         # 5. Update the event
@@ -169,5 +193,34 @@ def main():
         else:
             logger.error(f"Failed to update event {event_id} with API details")
 
+def _enrich_group(item):
+    """Run one address group; returns (address, error) so one failure doesn't stop the rest."""
+    address, address_events = item
+    try:
+        enrich_address_events(address, address_events)
+        return address, None
+    except Exception as e:
+        return address, e
+
+def main():
+    events = get_all_events()
+    logger.info(f"Found {len(events)} events to process.")
+
+    # Events sharing an address are handled together, in their original order, so each
+    # address costs one cache lookup; distinct addresses don't depend on each other.
+    events_by_address = {}
+    for event in events:
+        if not event["address"]:
+            logger.info(f"Processing event {event['id']}: Venue='{event['venue']}', Address='{event['address']}'")
+            logger.warning(f"Skipping event {event['id']} due to missing address.")
+            continue
+        events_by_address.setdefault(event["address"], []).append(event)
+
+    # The Supabase and Places calls are network-bound, so PLACES_WORKERS addresses are in flight at once
+    with ThreadPoolExecutor(max_workers=PLACES_WORKERS) as pool:
+        for address, error in pool.map(_enrich_group, events_by_address.items()):
+            if error is not None:
+                logger.error(f"Failed to enrich events for address '{address}': {error}")
+
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -4,13 +4,14 @@ import requests
 from dotenv import load_dotenv
 import subprocess
 import json
-from requests.exceptions import ConnectionError
+from requests.exceptions import ConnectionError, Timeout
 import socket
 import platform
 
 load_dotenv()
 
 LAMBDA_API_URL = "https://cloud.lambdalabs.com/api/v1/instance-operations"
+LAMBDA_INSTANCES_URL = "https://cloud.lambdalabs.com/api/v1/instances"
 LAMBDA_API_KEY = os.getenv("LAMBDA_API_KEY")
 GPU_INSTANCE_TYPE = os.getenv("GPU_INSTANCE_TYPE", "gpu_1x_a10")
 SSH_KEY_NAME = os.getenv("SSH_KEY_NAME")
@@ -25,6 +26,13 @@ REGIONS = [
 ]
 OUTER_TRIES = 30  # Number of times to repeat the region cycle
 PAUSE_BETWEEN_CYCLES = 215  # Seconds to wait between cycles
+DEAD_INSTANCE_STATUSES = {"terminating", "terminated", "failed"}  # wait_for_ip stops polling on these
+# Share one SSH connection between the ssh/scp calls made against the instance
+SSH_MUX_OPTS = [
+    "-o", "ControlMaster=auto",
+    "-o", "ControlPath=~/.ssh/cm-%r@%h:%p",
+    "-o", "ControlPersist=60s",
+]
 
 # Note: This script is intended to be run from WSL or Linux. Activate your venv before running:
 # source /path/to/venv/bin/activate
@@ -34,6 +42,9 @@ headers = {
     "Content-Type": "application/json"
 }
 
+# Reused across polls so each request doesn't pay for a new TCP+TLS handshake
+_SESSION = requests.Session()
+
 def create_instance(region, max_retries=3, retry_delay=5):
     payload = {
         "region_name":   region,
@@ -85,17 +96,23 @@ def create_instance(region, max_retries=3, retry_delay=5):
                 print("[!] Max retries reached. Giving up on this region.")
                 return None
 
-def wait_for_ip(instance_id, poll_interval=5, max_retries=3, retry_delay=5):
+def wait_for_ip(instance_id, poll_interval=3, max_poll_interval=30, max_retries=3, retry_delay=5):
+    """Poll the instances list until instance_id is active with an IP.
+
+    The poll interval starts at poll_interval and grows 1.5x per poll up to
+    max_poll_interval. Returns None if the instance ends up in a dead state.
+    """
     print(f"[…] Waiting for public IP of instance {instance_id} …")
     poll_count = 0
+    delay = poll_interval
     while True:
         poll_count += 1
         for attempt in range(1, max_retries + 1):
             try:
-                r = requests.get("https://cloud.lambdalabs.com/api/v1/instances", headers=headers)
+                r = _SESSION.get(LAMBDA_INSTANCES_URL, headers=headers, timeout=10)
                 r.raise_for_status()
                 break  # Success, break out of retry loop
-            except ConnectionError as e:
+            except (ConnectionError, Timeout) as e:
                 print(f"[!] Network error while polling for IP (attempt {attempt}/{max_retries}): {e}")
                 if attempt < max_retries:
                     print(f"[!] Retrying in {retry_delay} seconds...")
@@ -112,12 +129,16 @@ def wait_for_ip(instance_id, poll_interval=5, max_retries=3, retry_delay=5):
                 if status == "active" and ip:
                     print(f"[✓] Instance is active! IP: {ip}")
                     return ip
+                if status in DEAD_INSTANCE_STATUSES:
+                    print(f"[!] Instance {instance_id} is {status}; giving up on it.")
+                    return None
                 print(f"[ ] Poll #{poll_count}: status={status}, ip={ip or 'pending'}")
                 found = True
                 break
         if not found:
             print(f"[ ] Poll #{poll_count}: instance not found yet.")
-        time.sleep(poll_interval)
+        time.sleep(delay)
+        delay = min(delay * 1.5, max_poll_interval)
 
 def wait_for_ssh(ip, port=22, attempts=30, poll_interval=10):
     print(f"[WAIT] Waiting for SSH to become available at {ip}...")
@@ -186,6 +207,9 @@ if __name__ == "__main__":
 
     # ── At this point we have instance_id, now wait for its IP ──
     ip = wait_for_ip(instance_id)
+    if not ip:
+        terminate_instance(instance_id)
+        exit(1)
 
     # SSH in and clone the repo first (ensure directory exists)
     print(f"[ ] Cloning repo on {ip}…")
@@ -193,33 +217,37 @@ if __name__ == "__main__":
         "ssh",
         "-i", PRIVATE_SSH_KEY_PATH,
         "-o", "StrictHostKeyChecking=no",
+        *SSH_MUX_OPTS,
         f"ubuntu@{ip}"
     ]
     subprocess.run(ssh_base + [
         "git clone --branch master https://github.com/MTAleadgen/TheSauceo3StrategyNew.git || true"
     ], check=True)
 
+    # ── Install system deps + requirements in the background while the .env is copied ──
+    print(f"[ ] Installing dependencies on {ip}…")
+    install_cmd = ssh_base + [
+        "sudo apt-get update && sudo apt-get install -y python3 python3-pip python3-venv git"
+        " && cd TheSauceo3StrategyNew && python3 -m venv venv && source venv/bin/activate"
+        " && pip install --upgrade pip && pip install -r requirements.txt"
+    ]
+    install_proc = subprocess.Popen(install_cmd)
+
     # Now copy .env file to remote instance
     print(f"[ ] Copying .env file to {ip}…")
     scp_cmd = [
         "scp",
         "-i", PRIVATE_SSH_KEY_PATH,
         "-o", "StrictHostKeyChecking=no",
+        *SSH_MUX_OPTS,
         os.path.expanduser(".env"),
         f"ubuntu@{ip}:~/TheSauceo3StrategyNew/.env"
     ]
     subprocess.run(scp_cmd, check=True)
 
-    # ── SSH in, install dependencies, pull repo, and run clean_events.py ──
-    print(f"[ ] Installing dependencies and pulling repo on {ip}…")
-    # Update and install system deps, python, git, venv
-    subprocess.run(ssh_base + [
-        "sudo apt-get update && sudo apt-get install -y python3 python3-pip python3-venv git"
-    ], check=True)
-    # Set up venv and install requirements
-    subprocess.run(ssh_base + [
-        "cd TheSauceo3StrategyNew && python3 -m venv venv && source venv/bin/activate && pip install --upgrade pip && pip install -r requirements.txt"
-    ], check=True)
+    # The pipeline needs the environment, so wait for the install before running it
+    if install_proc.wait():
+        raise subprocess.CalledProcessError(install_proc.returncode, install_cmd)
     # Run clean_events.py
     print(f"[ ] Running clean_events.py on {ip}…")
     subprocess.run(ssh_base + [
@@ -237,6 +265,7 @@ if __name__ == "__main__":
         "scp",
         "-i", PRIVATE_SSH_KEY_PATH,
         "-o", "StrictHostKeyChecking=no",
+        *SSH_MUX_OPTS,
         f"ubuntu@{ip}:~/TheSauceo3StrategyNew/logs/clean_events.log",
         "./logs/clean_events.log"
     ]